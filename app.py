@@ -1,135 +1,186 @@
 import gradio as gr
-import asyncio
-import edge_tts
-import tempfile
 import os
 import datetime
-from pydub import AudioSegment
-from pydub.utils import mediainfo
-
-# 🌍 Language and voice mappings (All Voices Restored)
-language_voice_map = {
-    "English US": [
-        ("🧔 Guy", "en-US-GuyNeural"),
-        ("🧔 Eric", "en-US-EricNeural"),
-        ("🧔 Davis", "en-US-DavisNeural"),
-        ("🧔 Christopher", "en-US-ChristopherNeural"),
-        ("🧔 Andrew", "en-US-AndrewNeural"),
-        ("🧔 Brian", "en-US-BrianNeural"),
-        ("🧔 Roger", "en-US-RogerNeural"),
-        ("🧔 Steffan", "en-US-SteffanNeural"),
-        ("🧔 Tony", "en-US-TonyNeural"),
-        ("🧔 Jacob", "en-US-JacobNeural"),
-        ("🧔 Jason", "en-US-JasonNeural"),
-        ("🧔 Henry", "en-US-HenryNeural"),
-        ("🧔 Alan", "en-US-AlanNeural"),
-        ("🧔 Walt", "en-US-WaltNeural"),
-        ("🧔 Grant", "en-US-GrantNeural"),
-        ("🧔 Brandon", "en-US-BrandonNeural"),
-        ("🧔 Brandon Multi", "en-US-BrandonMultilingualNeural"),
-        ("🧔 Andrew Multi", "en-US-AndrewMultilingualNeural"),
-        ("🧔 Brian Multi", "en-US-BrianMultilingualNeural"),
-        ("🧔 Tony Multi", "en-US-TonyMultilingualNeural")
-    ],
-    "English UK": [
-        ("🧔 Ryan", "en-GB-RyanNeural"),
-        ("👩 Sonia", "en-GB-SoniaNeural")
-    ],
-    "Urdu": [
-        ("🧔 Asad", "ur-PK-AsadNeural"),
-        ("👩 Uzma", "ur-PK-UzmaNeural")
-    ],
-    "Spanish": [
-        ("🧔 Alvaro", "es-ES-AlvaroNeural"),
-        ("👩 Elvira", "es-ES-ElviraNeural")
-    ],
-    "French": [
-        ("🧔 Henri", "fr-FR-HenriNeural"),
-        ("👩 Denise", "fr-FR-DeniseNeural")
-    ],
-    "German": [
-        ("🧔 Conrad", "de-DE-ConradNeural"),
-        ("👩 Katja", "de-DE-KatjaNeural")
-    ],
-    "Portuguese": [
-        ("👩 Francisca", "pt-BR-FranciscaNeural"),
-        ("👩 Raquel", "pt-PT-RaquelNeural"),
-        ("🧔 Antonio", "pt-BR-AntonioNeural"),
-        ("🧔 Duarte", "pt-PT-DuarteNeural")
-    ]
-}
+import time
+import functools
+from voicegen import synthesize_chunks, split_text, rechunk, generate_audio, audio_cache, merge_chunks_async, warm_up, service_loop, InOrderBuffer
+from voicegen import FORMATS, DEFAULT_FORMAT, get_format
+from voicegen.previews import preview_library, preview_voice_ids
+from voicegen.voices import voice_catalog
+from voicegen.local import register_local_voices
+from voicegen.dialogue import DIALOGUE_GAP, plan_dialogue, gap_audio
+from voicegen.spool import spool, gradio_files
+from voicegen.jobs import job_manager, DONE
+from voicegen.scheduler import scheduler, UI_CONCURRENCY
+from voicegen.batch import read_batch, render_batch
+from voicegen.logs import configure_logging, new_request_id, request_id
+from voicegen.api import mount_api
+from voicegen.worker import start_workers
+from voicegen.metrics import mount_metrics, requests_total, time_to_first_audio, bytes_served
 
-# ✂️ Split text into chunks
-def split_text(text, max_chars=4500):
-    words = text.split()
-    chunks, current = [], ""
-    for w in words:
-        if len(current) + len(w) + 1 <= max_chars:
-            current += " " + w
-        else:
-            chunks.append(current.strip())
-            current = w
-    if current:
-        chunks.append(current.strip())
-    return chunks
-
-# 🔊 Async TTS
-async def generate_audio(text, voice_id):
-    out_file = tempfile.NamedTemporaryFile(delete=False, suffix=".mp3").name
-    try:
-        communicate = edge_tts.Communicate(text, voice=voice_id)
-        await communicate.save(out_file)
-        return out_file
-    except Exception as e:
-        print("TTS Error:", str(e))
-        return None
+# 🌍 Languages and voices come from the indexed catalog (voices.txt, refreshed in the background)
+DEFAULT_LANGUAGE = "English US"
+register_local_voices()  # 💻 Offline ChatterboxTTS voices under English US, when installed
 
 # Update voices dropdown
 def update_voices(language):
-    return gr.update(choices=[label for (label, _) in language_voice_map[language]], value=None)
+    return gr.update(choices=voice_catalog.labels(language), value=None)
 
 # Play sample async
 async def play_sample(voice_label, language):
-    voices = language_voice_map.get(language, [])
-    voice_id = next((v for (label, v) in voices if label == voice_label), None)
-    return await generate_audio("This is a voice sample", voice_id)
+    voice_id = voice_catalog.find(language, voice_label)
+    return await preview_library.get(voice_id)
 
 # Sync wrapper for Gradio
 def play_sample_sync(voice_label, language):
-    return asyncio.run(play_sample(voice_label, language))
+    return service_loop.run(play_sample(voice_label, language))
 
 # Generate full audio with merging
-async def wrapped_generate(text, language, voice):
-    voices = language_voice_map.get(language, [])
-    voice_id = next((v for (label, v) in voices if label == voice), None)
+# Yields (live audio bytes, merged file, download file, status). The live player
+# is a streaming output: b"" means "nothing new yet", None would end the stream.
+async def wrapped_generate(text, language, voice, stream=True, format_name=DEFAULT_FORMAT.name,
+                           dialogue=False, gap=DIALOGUE_GAP, history=None):
+    voice_id = voice_catalog.find(language, voice)
     if not voice_id or not text:
-        yield None, None, "❌ Voice or text missing."
+        requests_total.inc(outcome="invalid")
+        yield b"", None, None, "❌ Voice or text missing."
         return
 
-    chunks = split_text(text)
-    temp_audio_files = []
-    status_msgs = []
-
-    for i, chunk in enumerate(chunks):
-        status_msgs.append(f"🔄 Generating chunk {i+1}/{len(chunks)}...")
-        yield None, None, "\n".join(status_msgs)
-        output_path = await generate_audio(chunk, voice_id)
-        await asyncio.sleep(0.1)
-        if output_path:
-            temp_audio_files.append(output_path)
-        else:
-            yield None, None, f"❌ Failed at chunk {i+1}"
+    rid, started = new_request_id(), time.monotonic()
+    # 🎭 Dialogue: "Speaker: line" scripts, every speaker in their own voice
+    plan = None
+    if dialogue:
+        try:
+            plan = plan_dialogue(text, functools.partial(voice_catalog.resolve, language), voice_id,
+                                 voice_catalog.voice_ids(language))
+        except ValueError as e:
+            requests_total.inc(outcome="invalid")
+            yield b"", None, None, f"❌ {e}"
             return
+    # ✏️ After an edit, unchanged chunks keep their boundaries (and so their cached audio)
+    reused = []
+    if plan:
+        chunks = plan.chunks
+    elif history and history.get("chunks"):
+        chunks, reused = rechunk(history["chunks"], text)
+    else:
+        chunks = split_text(text)
+    if history is not None and not plan:
+        history["chunks"] = chunks
+    voices = plan.voices if plan else voice_id
+    busy = scheduler.busy_message(len(chunks))
+    if busy:
+        requests_total.inc(outcome="busy")
+        yield b"", None, None, busy
+        return
+    audio_format = get_format(format_name)
+    synthesize = functools.partial(generate_audio, output_format=audio_format.edge_format)
+    gap_part = gap_audio(gap, audio_format.edge_format) if plan else b""
+    joiner = audio_format.joiner()
+    ordered = InOrderBuffer(len(chunks))
+    status_msgs = [f"🔄 Generating {len(chunks)} chunk(s)..."]
+    if reused:
+        status_msgs.append(f"♻️ {len(reused)} unchanged chunk(s) reused from the previous version")
+    if plan:
+        status_msgs.append(f"🎭 Speakers: {plan.summary()}")
+    yield b"", None, None, "\n".join(status_msgs)
+
+    # A failed chunk (after retries) doesn't stop the others: everything that
+    # finishes is cached, so pressing Generate again only redoes the failures.
+    done, failed, first_audio = 0, [], True
+    # Gradio runs every step of this generator in a fresh context, so the
+    # request id is bound again right before work that logs
+    request_id.set(rid)
+    async for i, audio in synthesize_chunks(chunks, voices, synthesize):
+        if not audio:
+            failed.append(i + 1)
+            status_msgs.append(f"⚠️ Chunk {i+1} failed")
+            yield b"", None, None, "\n".join(status_msgs)
+            continue
+        ready = ordered.add(i, audio)
+        if plan:  # silence between lines, counted from the first released chunk
+            ready = plan.with_gaps(ordered.next_index - len(ready), ready, gap_part)
+        done += 1
+        status_msgs.append(f"✅ Chunk {i+1} ready ({done}/{len(chunks)})")
+        live = b"".join(joiner.add(a) for a in ready) if stream else b""
+        if live:
+            if first_audio:
+                time_to_first_audio.observe(time.monotonic() - started)
+                first_audio = False
+            bytes_served.inc(len(live), kind="live")
+        yield live, None, None, "\n".join(status_msgs)
+
+    if failed:
+        requests_total.inc(outcome="failed")
+        yield b"", None, None, (f"❌ Failed at chunk(s) {', '.join(map(str, sorted(failed)))}. "
+                                f"{done}/{len(chunks)} chunks are saved; click Generate again to resume. (request {rid})")
+        return
+
+    # Join chunks at the container level on the merge pool: no decode, no ffmpeg, no re-encode
+    status_msgs.append("🔗 Merging chunks...")
+    yield b"", None, None, "\n".join(status_msgs)
+    request_id.set(rid)
+    parts = list(plan.with_gaps(0, ordered.items, gap_part)) if plan else ordered.items
+    merged_path, info = await merge_chunks_async(parts, audio_format=audio_format)
+    requests_total.inc(outcome="done")
+    bytes_served.inc(os.path.getsize(merged_path), kind="file")
+    duration_str = str(datetime.timedelta(seconds=int(info.duration)))
+    yield b"", merged_path, merged_path, f"✅ Done! Total duration: {duration_str}\n♻️ Cache: {audio_cache.summary()}"
+
+# 🗂️ Background jobs: keep running if the tab closes, resume after restarts
+def submit_job(text, language, voice, format_name=DEFAULT_FORMAT.name):
+    voice_id = voice_catalog.find(language, voice)
+    if not voice_id or not text:
+        return "", "❌ Voice or text missing."
+    job = job_manager.submit(text, voice_id, get_format(format_name).edge_format)
+    return job.id, job.describe()
+
+def revise_job(job_id, text, language, voice, format_name=DEFAULT_FORMAT.name):
+    # Only the chunks whose text changed since the job's script are synthesized again
+    if not text:
+        return job_id, "❌ No text provided."
+    job = job_manager.revise((job_id or "").strip(), text, voice_catalog.find(language, voice),
+                             get_format(format_name).edge_format)
+    return (job.id, job.describe()) if job else (job_id, f"❌ Unknown job: {job_id}")
+
+async def watch_job(job_id):
+    job_id = (job_id or "").strip()
+    if job_manager.get(job_id) is None:
+        yield None, f"❌ Unknown job: {job_id}"
+        return
+    async for job in job_manager.watch(job_id):
+        ready = job.status == DONE and os.path.exists(job.result_path)
+        yield (job.result_path if ready else None), job.describe()
 
-    final_audio = AudioSegment.empty()
-    for file in temp_audio_files:
-        final_audio += AudioSegment.from_file(file, format="mp3")
+def resume_job(job_id):
+    job = job_manager.resume((job_id or "").strip())
+    return job.describe() if job else f"❌ Unknown job: {job_id}"
 
-    merged_path = os.path.join(tempfile.gettempdir(), f"voice_output_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.mp3")
-    final_audio.export(merged_path, format="mp3")
-    info = mediainfo(merged_path)
-    duration_str = str(datetime.timedelta(seconds=int(float(info['duration']))))
-    yield merged_path, merged_path, f"✅ Done! Total duration: {duration_str}"
+# 📦 Batch: a CSV/JSON of (id, text, language, voice) rows rendered into one zip
+def resolve_voice(language, voice):
+    # Rows may name a voice by its label or its ID; without a known language, any voice matches
+    return voice_catalog.resolve(language, voice)
+
+async def run_batch(batch_file, format_name=DEFAULT_FORMAT.name):
+    if batch_file is None:
+        yield None, "❌ Upload a CSV or JSON file first."
+        return
+    try:
+        rows = read_batch(batch_file.name)
+    except Exception as e:
+        yield None, f"❌ Could not read batch file: {e}"
+        return
+    if not rows:
+        yield None, "❌ The batch file has no rows."
+        return
+    rid = new_request_id()
+    yield None, f"📦 Rendering {len(rows)} row(s)..."
+    request_id.set(rid)  # each generator step runs in its own context
+    async for zip_path, message in render_batch(rows, resolve_voice, get_format(format_name)):
+        if zip_path is None:
+            yield None, message
+            continue
+        yield zip_path, message
 
 # 🌈 Premium Card UI CSS
 premium_css = """
@@ -185,30 +236,80 @@ with gr.Blocks(css=premium_css, title="✨ Viddyx Premium Voice Generator") as a
     gr.Markdown("# ✨ **Viddyx Premium Voice Generator**")
 
     with gr.Row():
-        language = gr.Dropdown(label="🌍 Choose Language", choices=list(language_voice_map.keys()), value="English US")
+        language = gr.Dropdown(label="🌍 Choose Language", choices=voice_catalog.languages(), value=DEFAULT_LANGUAGE)
         voice = gr.Dropdown(label="🧑‍🎤 Choose Voice")
 
     sample_audio = gr.Audio(label="🔊 Voice Preview", type="filepath")
     gr.Button("🎧 Preview Voice").click(fn=play_sample_sync, inputs=[voice, language], outputs=sample_audio)
 
     text_input = gr.Textbox(label="📜 Enter your text", placeholder="Type or paste your script here...", lines=5)
+    with gr.Row():
+        stream_toggle = gr.Checkbox(label="⚡ Play audio while it's being generated", value=True)
+        # Requested from edge-tts directly; Opus is a fraction of the MP3 size
+        output_format = gr.Dropdown(label="🎚️ Output Format", choices=list(FORMATS), value=DEFAULT_FORMAT.name)
+    with gr.Row():
+        dialogue_toggle = gr.Checkbox(label="🎭 Dialogue script (\"Speaker: line\", cast with \"Speaker = voice\")", value=False)
+        gap_slider = gr.Slider(label="⏸️ Pause between lines (s)", minimum=0.0, maximum=2.0, step=0.05, value=DIALOGUE_GAP)
 
     with gr.Row():
         generate_btn = gr.Button("▶️ Generate Audio")
+        live_output = gr.Audio(label="🎧 Live Playback", streaming=True, autoplay=True)
         audio_output = gr.Audio(label="🔊 Output Audio", type="filepath")
-        download_output = gr.File(label="⬇️ Download MP3")
+        download_output = gr.File(label="⬇️ Download Audio")
 
     status = gr.Markdown("")
+    script_history = gr.State({})  # chunks of this session's last script, updated in place
 
     generate_btn.click(
         fn=wrapped_generate,
-        inputs=[text_input, language, voice],
-        outputs=[audio_output, download_output, status]
+        inputs=[text_input, language, voice, stream_toggle, output_format, dialogue_toggle, gap_slider,
+                script_history],
+        outputs=[live_output, audio_output, download_output, status]
     )
 
+    with gr.Accordion("🗂️ Background Job (long scripts)", open=False):
+        with gr.Row():
+            submit_job_btn = gr.Button("📤 Submit as Background Job")
+            job_id_box = gr.Textbox(label="🆔 Job ID", placeholder="Paste a job ID to check on it later")
+            watch_job_btn = gr.Button("🔍 Check Job")
+            resume_job_btn = gr.Button("🔁 Resume Job")
+            revise_job_btn = gr.Button("✏️ Re-render Edited Script")
+        job_file = gr.File(label="⬇️ Job Result")
+        job_status = gr.Markdown("")
+
+    submit_job_btn.click(fn=submit_job, inputs=[text_input, language, voice, output_format], outputs=[job_id_box, job_status])
+    watch_job_btn.click(fn=watch_job, inputs=job_id_box, outputs=[job_file, job_status])
+    resume_job_btn.click(fn=resume_job, inputs=job_id_box, outputs=job_status)
+    revise_job_btn.click(fn=revise_job, inputs=[job_id_box, text_input, language, voice, output_format],
+                         outputs=[job_id_box, job_status])
+
+    with gr.Accordion("📦 Batch (CSV / JSON)", open=False):
+        gr.Markdown("Columns: `id`, `text`, `language`, `voice` (label or voice ID). Returns a zip of audio files with a `manifest.json`.")
+        with gr.Row():
+            batch_file = gr.File(label="📄 Script list", file_types=[".csv", ".json"])
+            batch_output = gr.File(label="⬇️ Batch Zip")
+        batch_btn = gr.Button("📦 Render Batch")
+        batch_status = gr.Markdown("")
+
+    batch_btn.click(fn=run_batch, inputs=[batch_file, output_format], outputs=[batch_output, batch_status])
+
     language.change(fn=update_voices, inputs=language, outputs=voice)
 
 # 🚀 Launch app
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8080))
-    app.launch(server_name="0.0.0.0", server_port=port, share=False)
+    configure_logging()  # JSON lines tagged with request ids
+    spool.start_janitor()
+    gradio_files.start_janitor()  # 🧹 Gradio keeps a copy of every file it serves
+    start_workers()  # 🧵 TTS_WORKERS synthesis processes sharing a SQLite chunk queue
+    warm_up()
+    job_manager.start()
+    voice_catalog.start_refresh()  # 🔄 Re-fetch the voice list once the snapshot is stale
+    preview_library.warm_in_background(preview_voice_ids(voice_catalog.voice_ids(DEFAULT_LANGUAGE)))
+    # Required for generator outputs and the streaming player. Upstream load is
+    # capped by the shared scheduler, so many sessions can wait on it at once.
+    app.queue(concurrency_count=UI_CONCURRENCY)
+    server_app, _, _ = app.launch(server_name="0.0.0.0", server_port=port, share=False, prevent_thread_lock=True)
+    mount_metrics(server_app)  # 📈 Prometheus scrape endpoint at /metrics
+    mount_api(server_app)  # 🔌 REST API at /v1 (streamed audio, Range, ETag)
+    app.block_thread()
@@ -1,154 +1,205 @@
 import gradio as gr
-import asyncio
-import edge_tts
-import tempfile
 import os
 import datetime
-from pydub import AudioSegment
-from pydub.utils import mediainfo
-
-# 🌍 Language and voice mappings
-language_voice_map = {
-    "English US": [
-        ("🧔 Guy", "en-US-GuyNeural"),
-        ("🧔 Eric", "en-US-EricNeural"),
-        ("🧔 Davis", "en-US-DavisNeural"),
-        ("🧔 Christopher", "en-US-ChristopherNeural"),
-        ("🧔 Andrew", "en-US-AndrewNeural"),
-        ("🧔 Brian", "en-US-BrianNeural"),
-        ("🧔 Roger", "en-US-RogerNeural"),
-        ("🧔 Steffan", "en-US-SteffanNeural"),
-        ("🧔 Tony", "en-US-TonyNeural"),
-        ("🧔 Jacob", "en-US-JacobNeural"),
-        ("🧔 Jason", "en-US-JasonNeural"),
-        ("🧔 Henry", "en-US-HenryNeural"),
-        ("🧔 Alan", "en-US-AlanNeural"),
-        ("🧔 Walt", "en-US-WaltNeural"),
-        ("🧔 Grant", "en-US-GrantNeural"),
-        ("🧔 Brandon", "en-US-BrandonNeural"),
-        ("🧔 Brandon Multi", "en-US-BrandonMultilingualNeural"),
-        ("🧔 Andrew Multi", "en-US-AndrewMultilingualNeural"),
-        ("🧔 Brian Multi", "en-US-BrianMultilingualNeural"),
-        ("🧔 Tony Multi", "en-US-TonyMultilingualNeural")
-    ],
-    "English UK": [
-        ("🧔 Ryan", "en-GB-RyanNeural"),
-        ("👩 Sonia", "en-GB-SoniaNeural")
-    ],
-    "Urdu": [
-        ("🧔 Asad", "ur-PK-AsadNeural"),
-        ("👩 Uzma", "ur-PK-UzmaNeural")
-    ],
-    "Spanish": [
-        ("🧔 Alvaro", "es-ES-AlvaroNeural"),
-        ("👩 Elvira", "es-ES-ElviraNeural")
-    ],
-    "French": [
-        ("🧔 Henri", "fr-FR-HenriNeural"),
-        ("👩 Denise", "fr-FR-DeniseNeural")
-    ],
-    "German": [
-        ("🧔 Conrad", "de-DE-ConradNeural"),
-        ("👩 Katja", "de-DE-KatjaNeural")
-    ],
-    "Portuguese": [
-        ("👩 Francisca", "pt-BR-FranciscaNeural"),
-        ("👩 Raquel", "pt-PT-RaquelNeural"),
-        ("🧔 Antonio", "pt-BR-AntonioNeural"),
-        ("🧔 Duarte", "pt-PT-DuarteNeural")
-    ]
-}
+import time
+import functools
+from voicegen import synthesize_chunks, split_text, rechunk, generate_audio, audio_cache, merge_chunks_async, warm_up, InOrderBuffer
+from voicegen import FORMATS, DEFAULT_FORMAT, get_format
+from voicegen.previews import preview_library, preview_voice_ids
+from voicegen.voices import voice_catalog
+from voicegen.local import register_local_voices
+from voicegen.dialogue import DIALOGUE_GAP, plan_dialogue, gap_audio
+from voicegen.spool import spool, gradio_files
+from voicegen.jobs import job_manager, DONE
+from voicegen.scheduler import scheduler, UI_CONCURRENCY
+from voicegen.batch import read_batch, render_batch
+from voicegen.logs import configure_logging, new_request_id, request_id
+from voicegen.api import mount_api
+from voicegen.worker import start_workers
+from voicegen.metrics import mount_metrics, requests_total, time_to_first_audio, bytes_served
 
-# ✂️ Split text into smaller chunks
-def split_text(text, max_chars=4500):
-    words = text.split()
-    chunks = []
-    current_chunk = ""
-    for word in words:
-        if len(current_chunk) + len(word) + 1 <= max_chars:
-            current_chunk += " " + word
-        else:
-            chunks.append(current_chunk.strip())
-            current_chunk = word
-    if current_chunk:
-        chunks.append(current_chunk.strip())
-    return chunks
-
-# 🔊 Async TTS generation
-async def generate_audio(text, voice_id):
-    output_file = tempfile.NamedTemporaryFile(delete=False, suffix=".mp3").name
-    try:
-        communicate = edge_tts.Communicate(text, voice=voice_id)
-        await communicate.save(output_file)
-        return output_file
-    except Exception as e:
-        print("Edge TTS Error:", str(e))
-        return None
+# 🌍 Languages and voices come from the indexed catalog (voices.txt, refreshed in the background)
+DEFAULT_LANGUAGE = "English US"
+register_local_voices()  # 💻 Offline ChatterboxTTS voices under English US, when installed
 
 # 📋 Update voices by language
 def update_voices(language):
-    voices = language_voice_map.get(language, [])
-    return gr.update(choices=[label for (label, _) in voices], value=voices[0][0] if voices else None)
+    labels = voice_catalog.labels(language)
+    return gr.update(choices=labels, value=labels[0] if labels else None)
 
 # 🔉 Play voice sample
 async def play_sample(voice_label, language):
-    voices = language_voice_map.get(language, [])
-    voice_id = next((v for (label, v) in voices if label == voice_label), None)
+    voice_id = voice_catalog.find(language, voice_label)
 
     if not voice_id:
         print("No voice ID found, using default voice.")
         voice_id = "en-US-GuyNeural"
 
-    return await generate_audio("This is a voice sample.", voice_id)
+    return await preview_library.get(voice_id)
 
 # 🔁 Full generation with chunking and merge
-async def wrapped_generate(text, language, voice):
-    voices = language_voice_map.get(language, [])
-    voice_id = next((v for (label, v) in voices if label == voice), None)
+# Outputs are (live audio bytes, merged file, download file, status). The live
+# player is a streaming output: b"" means "nothing new yet", None ends the stream.
+async def wrapped_generate(text, language, voice, stream=True, format_name=DEFAULT_FORMAT.name,
+                           dialogue=False, gap=DIALOGUE_GAP, history=None):
+    voice_id = voice_catalog.find(language, voice)
 
     if not voice_id:
         print("No voice ID found for generation. Using default voice.")
         voice_id = "en-US-GuyNeural"
 
     if not text:
-        yield None, None, "❌ No text provided."
+        requests_total.inc(outcome="invalid")
+        yield b"", None, None, "❌ No text provided."
         return
 
-    chunks = split_text(text)
-    total_chunks = len(chunks)
-    temp_audio_files = []
-    status_messages = []
-
-    for i, chunk in enumerate(chunks):
+    rid, started = new_request_id(), time.monotonic()
+    # 🎭 Dialogue: "Speaker: line" scripts, every speaker in their own voice
+    plan = None
+    if dialogue:
         try:
-            status_messages.append(f"🔄 Generating chunk {i+1}/{total_chunks}...")
-            status_str = "\n".join(status_messages)
-            yield None, None, status_str
-
-            output_path = await generate_audio(chunk, voice_id)
-            await asyncio.sleep(0.1)
-            if output_path:
-                temp_audio_files.append(output_path)
-            else:
-                yield None, None, f"❌ Failed at chunk {i+1}"
-                return
-        except Exception as e:
-            yield None, None, f"❌ Error in chunk {i+1}: {str(e)}"
+            plan = plan_dialogue(text, functools.partial(voice_catalog.resolve, language), voice_id,
+                                 voice_catalog.voice_ids(language))
+        except ValueError as e:
+            requests_total.inc(outcome="invalid")
+            yield b"", None, None, f"❌ {e}"
             return
+    # ✏️ After an edit, unchanged chunks keep their boundaries (and so their cached audio)
+    reused = []
+    if plan:
+        chunks = plan.chunks
+    elif history and history.get("chunks"):
+        chunks, reused = rechunk(history["chunks"], text)
+    else:
+        chunks = split_text(text)
+    if history is not None and not plan:
+        history["chunks"] = chunks
+    voices = plan.voices if plan else voice_id
+    busy = scheduler.busy_message(len(chunks))
+    if busy:
+        requests_total.inc(outcome="busy")
+        yield b"", None, None, busy
+        return
+    total_chunks = len(chunks)
+    audio_format = get_format(format_name)
+    synthesize = functools.partial(generate_audio, output_format=audio_format.edge_format)
+    gap_part = gap_audio(gap, audio_format.edge_format) if plan else b""
+    joiner = audio_format.joiner()  # turns chunks into one continuous stream for the live player
+    ordered = InOrderBuffer(total_chunks)
+    status_messages = [f"🔄 Generating {total_chunks} chunk(s)..."]
+    if reused:
+        status_messages.append(f"♻️ {len(reused)} unchanged chunk(s) reused from the previous version")
+    if plan:
+        status_messages.append(f"🎭 Speakers: {plan.summary()}")
+    yield b"", None, None, "\n".join(status_messages)
 
-    final_audio = AudioSegment.empty()
-    for file in temp_audio_files:
-        final_audio += AudioSegment.from_file(file, format="mp3")
+    # Chunks are synthesized concurrently and land in completion order;
+    # the buffer releases them to the live player strictly in script order.
+    # A chunk that still fails after retries doesn't stop the others; finished
+    # chunks are cached, so generating again resumes with only the failures.
+    completed, failed, first_audio = 0, [], True
+    # Gradio runs every step of this generator in a fresh context, so the
+    # request id is bound again right before work that logs
+    request_id.set(rid)
+    try:
+        async for i, audio in synthesize_chunks(chunks, voices, synthesize):
+            if not audio:
+                failed.append(i + 1)
+                status_messages.append(f"⚠️ Chunk {i+1} failed")
+                yield b"", None, None, "\n".join(status_messages)
+                continue
+            ready = ordered.add(i, audio)
+            if plan:  # silence between lines, counted from the first released chunk
+                ready = plan.with_gaps(ordered.next_index - len(ready), ready, gap_part)
+            completed += 1
+            status_messages.append(f"✅ Chunk {i+1} ready ({completed}/{total_chunks})")
+            live_audio = b"".join(joiner.add(a) for a in ready) if stream else b""
+            if live_audio:
+                if first_audio:
+                    time_to_first_audio.observe(time.monotonic() - started)
+                    first_audio = False
+                bytes_served.inc(len(live_audio), kind="live")
+            yield live_audio, None, None, "\n".join(status_messages)
+    except Exception as e:
+        requests_total.inc(outcome="error")
+        yield b"", None, None, f"❌ Error during generation: {str(e)}"
+        return
+
+    if failed:
+        failed_str = ", ".join(map(str, sorted(failed)))
+        requests_total.inc(outcome="failed")
+        yield b"", None, None, f"❌ Failed at chunk(s) {failed_str}. {completed}/{total_chunks} chunks are saved; click Generate again to resume. (request {rid})"
+        return
+
+    # Join chunks at the container level on the merge pool: no decode, no ffmpeg, no re-encode
+    status_messages.append("🔗 Merging chunks...")
+    yield b"", None, None, "\n".join(status_messages)
+    request_id.set(rid)
+    parts = list(plan.with_gaps(0, ordered.items, gap_part)) if plan else ordered.items
+    merged_path, info = await merge_chunks_async(parts, audio_format=audio_format)
+    requests_total.inc(outcome="done")
+    bytes_served.inc(os.path.getsize(merged_path), kind="file")
 
-    merged_path = os.path.join(tempfile.gettempdir(), f"voice_output_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.mp3")
-    final_audio.export(merged_path, format="mp3")
+    # Duration comes from the frame/page headers the merge already walked
+    duration_str = str(datetime.timedelta(seconds=int(info.duration)))
+    final_status = f"✅ Done! Total duration: {duration_str}\n♻️ Cache: {audio_cache.summary()}"
 
-    info = mediainfo(merged_path)
-    duration_sec = float(info['duration'])
-    duration_str = str(datetime.timedelta(seconds=int(duration_sec)))
-    final_status = f"✅ Done! Total duration: {duration_str}"
+    yield b"", merged_path, merged_path, final_status
 
-    yield merged_path, merged_path, final_status
+# 🗂️ Background jobs: keep running if the tab closes, resume after restarts
+def submit_job(text, language, voice, format_name=DEFAULT_FORMAT.name):
+    voice_id = voice_catalog.find(language, voice) or "en-US-GuyNeural"
+    if not text:
+        return "", "❌ No text provided."
+    job = job_manager.submit(text, voice_id, get_format(format_name).edge_format)
+    return job.id, job.describe()
+
+def revise_job(job_id, text, language, voice, format_name=DEFAULT_FORMAT.name):
+    # Only the chunks whose text changed since the job's script are synthesized again
+    if not text:
+        return job_id, "❌ No text provided."
+    job = job_manager.revise((job_id or "").strip(), text, voice_catalog.find(language, voice) or "en-US-GuyNeural",
+                             get_format(format_name).edge_format)
+    return (job.id, job.describe()) if job else (job_id, f"❌ Unknown job: {job_id}")
+
+async def watch_job(job_id):
+    job_id = (job_id or "").strip()
+    if job_manager.get(job_id) is None:
+        yield None, f"❌ Unknown job: {job_id}"
+        return
+    async for job in job_manager.watch(job_id):
+        ready = job.status == DONE and os.path.exists(job.result_path)
+        yield (job.result_path if ready else None), job.describe()
+
+def resume_job(job_id):
+    job = job_manager.resume((job_id or "").strip())
+    return job.describe() if job else f"❌ Unknown job: {job_id}"
+
+# 📦 Batch: a CSV/JSON of (id, text, language, voice) rows rendered into one zip
+def resolve_voice(language, voice):
+    # Rows may name a voice by its label or its ID; without a known language, any voice matches
+    return voice_catalog.resolve(language, voice)
+
+async def run_batch(batch_file, format_name=DEFAULT_FORMAT.name):
+    if batch_file is None:
+        yield None, "❌ Upload a CSV or JSON file first."
+        return
+    try:
+        rows = read_batch(batch_file.name)
+    except Exception as e:
+        yield None, f"❌ Could not read batch file: {e}"
+        return
+    if not rows:
+        yield None, "❌ The batch file has no rows."
+        return
+    rid = new_request_id()
+    yield None, f"📦 Rendering {len(rows)} row(s)..."
+    request_id.set(rid)  # each generator step runs in its own context
+    async for zip_path, message in render_batch(rows, resolve_voice, get_format(format_name)):
+        if zip_path is None:
+            yield None, message
+            continue
+        yield zip_path, message
 
 # 💻 Premium UI with Gradient Heading
 custom_css = """
@@ -185,7 +236,7 @@ with gr.Blocks(css=custom_css, title="✨ Viddyx Premium Voice Generator") as ap
     gr.Markdown("# ✨ Viddyx Premium Voice Generator")
 
     with gr.Row():
-        language = gr.Dropdown(label="🌍 Choose Language", choices=list(language_voice_map.keys()), value="English US")
+        language = gr.Dropdown(label="🌍 Choose Language", choices=voice_catalog.languages(), value=DEFAULT_LANGUAGE)
         voice = gr.Dropdown(label="🧑‍🎤 Choose Voice")
 
     sample_audio = gr.Audio(label="🔊 Voice Preview", type="filepath")
@@ -193,23 +244,71 @@ with gr.Blocks(css=custom_css, title="✨ Viddyx Premium Voice Generator") as ap
 
     text_input = gr.Textbox(label="📜 Enter your text", placeholder="Type or paste your script here...", lines=5)
 
+    with gr.Row():
+        stream_toggle = gr.Checkbox(label="⚡ Play audio while it's being generated", value=True)
+        # Requested from edge-tts directly; Opus is a fraction of the MP3 size
+        output_format = gr.Dropdown(label="🎚️ Output Format", choices=list(FORMATS), value=DEFAULT_FORMAT.name)
+    with gr.Row():
+        dialogue_toggle = gr.Checkbox(label="🎭 Dialogue script (\"Speaker: line\", cast with \"Speaker = voice\")", value=False)
+        gap_slider = gr.Slider(label="⏸️ Pause between lines (s)", minimum=0.0, maximum=2.0, step=0.05, value=DIALOGUE_GAP)
+
     with gr.Row():
         generate_btn = gr.Button("▶️ Generate Audio")
+        live_output = gr.Audio(label="🎧 Live Playback", streaming=True, autoplay=True)
         audio_output = gr.Audio(label="🔊 Output Audio", type="filepath")
-        download_output = gr.File(label="⬇️ Download MP3")
+        download_output = gr.File(label="⬇️ Download Audio")
 
     with gr.Row():
         status = gr.Markdown("")
+    script_history = gr.State({})  # chunks of this session's last script, updated in place
 
     generate_btn.click(
         fn=wrapped_generate,
-        inputs=[text_input, language, voice],
-        outputs=[audio_output, download_output, status]
+        inputs=[text_input, language, voice, stream_toggle, output_format, dialogue_toggle, gap_slider,
+                script_history],
+        outputs=[live_output, audio_output, download_output, status]
     )
 
+    with gr.Accordion("🗂️ Background Job (long scripts)", open=False):
+        with gr.Row():
+            submit_job_btn = gr.Button("📤 Submit as Background Job")
+            job_id_box = gr.Textbox(label="🆔 Job ID", placeholder="Paste a job ID to check on it later")
+            watch_job_btn = gr.Button("🔍 Check Job")
+            resume_job_btn = gr.Button("🔁 Resume Job")
+            revise_job_btn = gr.Button("✏️ Re-render Edited Script")
+        job_file = gr.File(label="⬇️ Job Result")
+        job_status = gr.Markdown("")
+
+    submit_job_btn.click(fn=submit_job, inputs=[text_input, language, voice, output_format], outputs=[job_id_box, job_status])
+    watch_job_btn.click(fn=watch_job, inputs=job_id_box, outputs=[job_file, job_status])
+    resume_job_btn.click(fn=resume_job, inputs=job_id_box, outputs=job_status)
+    revise_job_btn.click(fn=revise_job, inputs=[job_id_box, text_input, language, voice, output_format],
+                         outputs=[job_id_box, job_status])
+
+    with gr.Accordion("📦 Batch (CSV / JSON)", open=False):
+        gr.Markdown("Columns: `id`, `text`, `language`, `voice` (label or voice ID). Returns a zip of audio files with a `manifest.json`.")
+        with gr.Row():
+            batch_file = gr.File(label="📄 Script list", file_types=[".csv", ".json"])
+            batch_output = gr.File(label="⬇️ Batch Zip")
+        batch_btn = gr.Button("📦 Render Batch")
+        batch_status = gr.Markdown("")
+
+    batch_btn.click(fn=run_batch, inputs=[batch_file, output_format], outputs=[batch_output, batch_status])
+
     language.change(fn=update_voices, inputs=language, outputs=voice)
 
 # 🚀 Launch app
 port = int(os.environ.get("PORT", 7860))
-app.queue(concurrency_count=5)  # Enables Gradio's queue for streaming
-app.launch(server_name="0.0.0.0", server_port=port, share=True)
\ No newline at end of file
+configure_logging()  # JSON lines tagged with request ids
+spool.start_janitor()
+gradio_files.start_janitor()  # 🧹 Gradio keeps a copy of every file it serves
+start_workers()  # 🧵 TTS_WORKERS synthesis processes sharing a SQLite chunk queue
+warm_up()
+job_manager.start()
+voice_catalog.start_refresh()  # 🔄 Re-fetch the voice list once the snapshot is stale
+preview_library.warm_in_background(preview_voice_ids(voice_catalog.voice_ids(DEFAULT_LANGUAGE)))
+app.queue(concurrency_count=UI_CONCURRENCY)  # Upstream load is capped by the shared scheduler
+server_app, _, _ = app.launch(server_name="0.0.0.0", server_port=port, share=True, prevent_thread_lock=True)
+mount_metrics(server_app)  # 📈 Prometheus scrape endpoint at /metrics
+mount_api(server_app)  # 🔌 REST API at /v1 (streamed audio, Range, ETag)
+app.block_thread()
\ No newline at end of file
@@ -0,0 +1,144 @@
+"""
+Load generator for app.py: simulates concurrent Gradio users pressing
+Generate and reports time to first audio, job completion time and chunk
+throughput.
+
+Users run `wrapped_generate` from app.py in-process, behind the same number
+of workers as the Gradio queue, so everything from the scheduler down to the
+merge is exercised. By default it starts a local fake edge-tts server
+(`voicegen.fake_edge`) and a throwaway cache, so nothing reaches Microsoft's
+service:
+
+    python loadtest.py --users 20 --requests 3 --chars 3000 --latency 0.3 --error-rate 0.02
+
+`--workers N` hands the chunk calls to N worker processes (see
+`voicegen.worker`), and `--workers external` to a pool already running on
+TTS_QUEUE_DB; the report then shows how much CPU the UI process saved.
+"""
+import argparse
+import asyncio
+import importlib
+import os
+import resource
+import tempfile
+import time
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of `values` (0 < q <= 100), or None if empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, round(q / 100 * len(ordered)) - 1))]
+
+
+def script(user, request, chars):
+    """Distinct sentences per request so nothing is served from the cache."""
+    words = f"User {user} request {request} reads sentence number"
+    sentences, n = [], 0
+    while sum(len(s) + 1 for s in sentences) < chars:
+        n += 1
+        sentences.append(f"{words} {n} of the load test script.")
+    return " ".join(sentences)
+
+
+async def simulate_user(app, user, requests, chars, workers, results):
+    language = app.DEFAULT_LANGUAGE
+    voice = app.voice_catalog.labels(language)[0]
+    for request in range(requests):
+        text = script(user, request, chars)
+        chunks = len(app.split_text(text))
+        started = time.monotonic()
+        async with workers:
+            first_audio, status = None, ""
+            async for live, merged, _, status in app.wrapped_generate(text, language, voice, True):
+                if live and first_audio is None:
+                    first_audio = time.monotonic() - started
+            done = merged is not None
+        results.append({
+            "chunks": chunks,
+            "first_audio": first_audio,
+            "job": time.monotonic() - started if done else None,
+            "ok": done,
+            "status": status,
+        })
+
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def report(results, wall, cpu, extra):
+    ok = [r for r in results if r["ok"]]
+    lines = [f"requests: {len(results)}  ok: {len(ok)}  failed: {len(results) - len(ok)}  wall: {wall:.1f}s"]
+    for label, key in (("time to first audio", "first_audio"), ("job completion", "job")):
+        values = [r[key] for r in results if r[key] is not None]
+        if values:
+            p50, p95, p99 = (percentile(values, q) for q in (50, 95, 99))
+            lines.append(f"{label:<20} p50 {p50:.2f}s  p95 {p95:.2f}s  p99 {p99:.2f}s")
+    chunks = sum(r["chunks"] for r in ok)
+    lines.append(f"throughput           {chunks / wall:.1f} chunks/s  {len(ok) / wall * 60:.1f} jobs/min")
+    lines.append(f"UI process CPU       {cpu:.1f}s  {cpu / max(chunks, 1) * 1000:.1f} ms/chunk")
+    lines.extend(extra)
+    return "\n".join(lines)
+
+
+async def run(args):
+    # voicegen reads its settings at import, so nothing from it is imported before this point.
+    if not args.real:
+        os.environ["TTS_EDGE_URL"] = f"ws://127.0.0.1:{args.port}/edge"
+    if not args.keep_cache:
+        os.environ["TTS_CACHE_DIR"] = tempfile.mkdtemp(prefix="voicegen-loadtest-cache-")
+    # Merged outputs aren't needed afterwards
+    os.environ["TTS_SPOOL_DIR"] = tempfile.mkdtemp(prefix="voicegen-loadtest-spool-")
+    if args.workers and args.workers != "external":
+        os.environ["TTS_QUEUE_DB"] = os.path.join(tempfile.mkdtemp(prefix="voicegen-loadtest-queue-"), "queue.sqlite3")
+    from voicegen.edge import edge_pool
+    from voicegen.fake_edge import FakeEdgeServer
+    from voicegen.scheduler import UI_CONCURRENCY
+    from voicegen.worker import start_workers
+
+    server = None
+    if not args.real:
+        server = FakeEdgeServer(args.latency, args.jitter, args.error_rate, args.speed)
+        await server.start(port=args.port)
+    app = importlib.import_module(args.app)
+    if args.workers:
+        start_workers(args.workers)
+
+    workers = asyncio.Semaphore(args.ui_workers or UI_CONCURRENCY)
+    results = []
+    started, cpu = time.monotonic(), cpu_seconds()
+    await asyncio.gather(*(
+        simulate_user(app, user, args.requests, args.chars, workers, results) for user in range(args.users)
+    ))
+    wall, cpu = time.monotonic() - started, cpu_seconds() - cpu
+
+    extra = [f"upstream connections opened {edge_pool.opened}, reused {edge_pool.reused}"]
+    if server:
+        extra.append(f"fake server: {server.turns} turns, {server.errors} dropped")
+        await server.stop()
+    print(report(results, wall, cpu, extra))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent Gradio users against app.py.")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=2, help="Generate presses per user")
+    parser.add_argument("--chars", type=int, default=2000, help="script length per request")
+    parser.add_argument("--ui-workers", type=int, default=None, help="Gradio queue workers (default TTS_UI_CONCURRENCY)")
+    parser.add_argument("--app", default="app", help="module with wrapped_generate (app_premium launches on import)")
+    parser.add_argument("--keep-cache", action="store_true", help="use the configured cache instead of a fresh one")
+    parser.add_argument("--workers", default=None, help='worker processes for the chunk calls, or "external"')
+    parser.add_argument("--real", action="store_true", help="use TTS_EDGE_URL or the real service instead of a fake")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--speed", type=float, default=10.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+from .pipeline import synthesize_chunks, InOrderBuffer, DEFAULT_CONCURRENCY
+from .text import split_text, rechunk
+from .cache import AudioCache
+from .synthesis import generate_audio, audio_cache, resilience, warm_up, OUTPUT_FORMAT
+from .service_loop import service_loop
+from .backends import SynthesisBackend, get_backend, set_backend, register_backend, assign_voice, backend_for
+from .mp3 import concat_mp3, Mp3Info
+from .formats import AudioFormat, FORMATS, DEFAULT_FORMAT, get_format
+from .merge import merge_chunks, merge_chunks_async
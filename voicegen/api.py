@@ -0,0 +1,226 @@
+"""
+A small HTTP API next to the Gradio UI, on the same server:
+
+    POST /v1/tts             {"text", "voice", "language"?, "format"?}
+    GET  /v1/renders/<etag>  a finished render, with Range support
+    GET  /v1/voices          ?language=English US
+
+`/v1/tts` streams the audio with chunked transfer as chunks complete, in
+script order, so playback can start right away. Every render is named by
+an ETag computed from its chunks, voice and format before any synthesis:
+a request carrying a matching If-None-Match gets 304, and one for a render
+that has already finished is served from disk with Range support. The live
+stream is framed differently from the stored file, so it carries the weak
+form of the tag.
+"""
+import functools
+import hashlib
+import os
+import re
+import time
+
+from .formats import DEFAULT_FORMAT, FORMATS, get_format
+from .logs import logger, new_request_id
+from .merge import merge_chunks_async
+from .metrics import Counter, bytes_served, time_to_first_audio
+from .pipeline import InOrderBuffer, synthesize_chunks
+from .scheduler import scheduler
+from .spool import SPOOL_DIR, Spool
+from .synthesis import generate_audio
+from .text import split_text
+from .voices import voice_catalog
+
+
+RENDERS_DIR = os.environ.get("TTS_RENDERS_DIR", os.path.join(SPOOL_DIR, "renders"))
+RENDERS_TTL = int(os.environ.get("TTS_RENDERS_TTL", 24 * 3600))  # seconds a finished render is kept
+RENDERS_MAX_BYTES = int(os.environ.get("TTS_RENDERS_MAX_MB", 2048)) * 1024 * 1024
+READ_BYTES = 64 * 1024
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+api_requests = Counter("tts_api_requests_total", "HTTP API requests by route and status code.", ["route", "status"])
+
+
+def render_etag(chunks, voice_id, audio_format):
+    """Strong ETag of a render: the same chunks, voice and format give the same tag."""
+    digest = hashlib.sha256("\x00".join([voice_id, audio_format.edge_format, *chunks]).encode("utf-8"))
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+class RenderStore:
+    """Finished renders, one spool file per ETag, kept for a day by default."""
+
+    def __init__(self, root=RENDERS_DIR, ttl=RENDERS_TTL, max_bytes=RENDERS_MAX_BYTES):
+        self.spool = Spool(root, ttl, max_bytes)
+        self._paths = {}
+        for name in os.listdir(root):
+            if not name.endswith(".part"):
+                self._paths[name.split("_", 1)[0]] = os.path.join(root, name)
+
+    @staticmethod
+    def _name(etag):
+        return etag.strip('"')
+
+    def get(self, etag):
+        """Path of the finished render, or None (never rendered, or evicted)."""
+        path = self._paths.get(self._name(etag))
+        return path if path and os.path.exists(path) else None
+
+    async def put(self, etag, parts, audio_format):
+        path, info = await merge_chunks_async(parts, self._name(etag), self.spool, audio_format)
+        self._paths[self._name(etag)] = path
+        return path, info
+
+
+def _etag_matches(header, etag):
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+def _error(route, status, message, headers=None):
+    from fastapi.responses import JSONResponse
+
+    api_requests.inc(route=route, status=status)
+    return JSONResponse({"error": message}, status_code=status, headers=headers)
+
+
+def serve_render(request, path, etag, media_type, route="renders"):
+    """A finished render with ETag/If-None-Match and single-range Range support."""
+    from fastapi.responses import FileResponse, Response, StreamingResponse
+
+    headers = {"ETag": etag, "Accept-Ranges": "bytes", "Cache-Control": f"public, max-age={RENDERS_TTL}"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        api_requests.inc(route=route, status=304)
+        return Response(status_code=304, headers=headers)
+    size = os.path.getsize(path)
+    found = _RANGE_RE.match(request.headers.get("range", "").replace(" ", ""))
+    if_range = request.headers.get("if-range")
+    if not found or not any(found.groups()) or (if_range and if_range != etag):
+        api_requests.inc(route=route, status=200)
+        bytes_served.inc(size, kind="api")
+        return FileResponse(path, media_type=media_type, headers=headers)
+
+    first, last = found.groups()
+    if first:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    else:
+        start, end = max(0, size - int(last)), size - 1
+    if start >= size or start > end:
+        return _error(route, 416, "Range not satisfiable", {"Content-Range": f"bytes */{size}"})
+
+    def read():
+        with open(path, "rb") as f:
+            f.seek(start)
+            left = end - start + 1
+            while left > 0:
+                data = f.read(min(READ_BYTES, left))
+                if not data:
+                    return
+                left -= len(data)
+                yield data
+
+    headers.update({"Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(end - start + 1)})
+    api_requests.inc(route=route, status=206)
+    bytes_served.inc(end - start + 1, kind="api")
+    return StreamingResponse(read(), status_code=206, media_type=media_type, headers=headers)
+
+
+async def stream_render(chunks, voice_id, audio_format, etag, store, started):
+    """
+    Audio bytes in script order as chunks complete, then the render is saved
+    under `etag`. A chunk that fails after retries aborts the response, so
+    the client sees a truncated transfer rather than a short file.
+    """
+    synthesize = functools.partial(generate_audio, output_format=audio_format.edge_format)
+    joiner = audio_format.joiner()
+    ordered = InOrderBuffer(len(chunks))
+    first_audio = True
+    async for i, audio in synthesize_chunks(chunks, voice_id, synthesize):
+        if not audio:
+            logger.error("api_render_failed", extra={"etag": etag, "chunk": i + 1})
+            raise RuntimeError(f"chunk {i + 1} failed")
+        live = b"".join(joiner.add(a) for a in ordered.add(i, audio))
+        if live:
+            if first_audio:
+                time_to_first_audio.observe(time.monotonic() - started)
+                first_audio = False
+            bytes_served.inc(len(live), kind="api")
+            yield live
+    await store.put(etag, ordered.items, audio_format)
+
+
+def mount_api(fastapi_app, store=None, prefix="/v1"):
+    """Add the API routes to a FastAPI app (e.g. the one `gr.Blocks.launch` returns)."""
+    from fastapi import Request
+    from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+    store = store or RenderStore()
+    store.spool.start_janitor()
+
+    async def tts(request: Request):
+        started = time.monotonic()
+        try:
+            body = await request.json()
+        except ValueError:
+            return _error("tts", 400, "Expected a JSON body")
+        if not isinstance(body, dict):
+            return _error("tts", 400, "Expected a JSON object")
+        wrong = [name for name in ("text", "voice", "language", "format")
+                 if body.get(name) is not None and not isinstance(body[name], str)]
+        if wrong:
+            return _error("tts", 400, f"Field '{wrong[0]}' must be a string")
+        if not (body.get("text") or "").strip():
+            return _error("tts", 400, "Field 'text' is required")
+        voice_id = voice_catalog.resolve(body.get("language") or "", body.get("voice") or "")
+        if not voice_id:
+            return _error("tts", 400, f"Unknown voice: {body.get('voice')!r}")
+        name = body.get("format") or DEFAULT_FORMAT.name
+        if name not in FORMATS and name not in {f.edge_format for f in FORMATS.values()}:
+            return _error("tts", 400, f"Unknown format: {name!r} (known: {', '.join(FORMATS)})")
+        audio_format = get_format(name)
+
+        chunks = split_text(body["text"])
+        etag = render_etag(chunks, voice_id, audio_format)
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            api_requests.inc(route="tts", status=304)
+            return Response(status_code=304, headers={"ETag": etag})
+        path = store.get(etag)
+        if path:
+            return serve_render(request, path, etag, audio_format.media_type, route="tts")
+        busy = scheduler.busy_message(len(chunks))
+        if busy:
+            return _error("tts", 503, busy, {"Retry-After": "10"})
+
+        rid = new_request_id()
+        api_requests.inc(route="tts", status=200)
+        location = f"{prefix}/renders/" + etag.strip('"')
+        # The live stream's container framing (WebM duration, Ogg end of
+        # stream, WAV sizes) differs from the stored render's, so it only
+        # gets a weak tag: If-None-Match still matches, If-Range never does.
+        return StreamingResponse(
+            stream_render(chunks, voice_id, audio_format, etag, store, started),
+            media_type=audio_format.media_type,
+            headers={"ETag": "W/" + etag, "Content-Location": location, "X-Request-Id": rid},
+        )
+
+    async def render(etag: str, request: Request):
+        path = store.get(etag)
+        if not path:
+            return _error("renders", 404, "Unknown or expired render")
+        media_type = next((f.media_type for f in FORMATS.values() if path.endswith(f.suffix)), None)
+        return serve_render(request, path, f'"{etag}"', media_type)
+
+    async def voices(language: str = None):
+        api_requests.inc(route="voices", status=200)
+        return JSONResponse([
+            {"voice_id": v.voice_id, "label": v.label, "language": v.language, "locale": v.locale,
+             "gender": v.gender, "backend": v.backend}
+            for v in voice_catalog.voices(language)
+        ])
+
+    fastapi_app.add_api_route(f"{prefix}/tts", tts, methods=["POST"])
+    fastapi_app.add_api_route(prefix + "/renders/{etag}", render, methods=["GET"])
+    fastapi_app.add_api_route(f"{prefix}/voices", voices, methods=["GET"])
+    return store
@@ -0,0 +1,126 @@
+import os
+
+from .edge import edge_pool
+
+
+# Which registered backend `generate_audio` uses.
+BACKEND = os.environ.get("TTS_BACKEND", "edge")
+
+
+class SynthesisBackend:
+    """
+    Where chunk audio comes from. `generate_audio` wraps every call in the
+    cache, the scheduler and retries, so a backend only has to turn one chunk
+    into audio bytes in the requested edge-tts output format, or raise.
+
+    Methods run on the service loop.
+    """
+
+    name = None
+    # Remote backends share the upstream scheduler's slots and get retries
+    # and hedged requests; local ones are called directly.
+    remote = True
+
+    def cache_format(self, output_format):
+        """The format part of the cache key; keeps different backends' audio apart."""
+        return f"{self.name}:{output_format}"
+
+    async def synthesize(self, text, voice_id, output_format):
+        raise NotImplementedError
+
+    async def warm(self):
+        """Prepare connections or models ahead of the first request."""
+
+    async def close(self):
+        """Release connections before the event loop stops."""
+
+
+class EdgeBackend(SynthesisBackend):
+    """The Edge read-aloud service, over the pooled websockets in `edge_pool`."""
+
+    name = "edge"
+
+    def __init__(self, pool=edge_pool):
+        self.pool = pool
+
+    def cache_format(self, output_format):
+        # Cache entries written before backends existed stay valid.
+        return output_format
+
+    async def synthesize(self, text, voice_id, output_format):
+        return await self.pool.synthesize(text, voice_id, output_format)
+
+    async def warm(self):
+        await self.pool.warm()
+
+    async def close(self):
+        await self.pool.close()
+
+
+_factories = {"edge": EdgeBackend}
+_instances = {}
+_voices = {}  # voice id -> backend name, for voices the active backend doesn't serve
+_active = None
+_dispatcher = None  # when set, remote backends' calls run in worker processes (see workqueue)
+
+
+def register_backend(name, factory):
+    """Make `factory()` available as backend `name` (for TTS_BACKEND or `set_backend`)."""
+    _factories[name] = factory
+
+
+def backend_named(name):
+    """The one instance of registered backend `name`, created on first use."""
+    if name not in _instances:
+        if name not in _factories:
+            raise ValueError(f"Unknown TTS backend: {name} (known: {', '.join(sorted(_factories))})")
+        _instances[name] = _factories[name]()
+    return _instances[name]
+
+
+def set_backend(backend):
+    """Switch the active backend, given a registered name or a `SynthesisBackend`."""
+    global _active
+    if isinstance(backend, str):
+        backend = backend_named(backend)
+    _active = backend
+    return backend
+
+
+def get_backend():
+    """The active backend, created from TTS_BACKEND on first use."""
+    return _active or set_backend(BACKEND)
+
+
+def assign_voice(voice_id, name):
+    """Serve `voice_id` from registered backend `name` whatever the active backend is."""
+    backend_named(name)
+    _voices[voice_id] = name
+
+
+def backend_for(voice_id):
+    """The backend that synthesizes `voice_id`: its assigned one, else the active one."""
+    name = _voices.get(voice_id)
+    backend = backend_named(name) if name else get_backend()
+    if _dispatcher is not None and backend.remote:
+        return _dispatcher.backend(backend)
+    return backend
+
+
+def set_dispatcher(dispatcher):
+    """Hand remote chunk calls to worker processes through a `workqueue.Dispatcher`; None calls them in-process."""
+    global _dispatcher
+    _dispatcher = dispatcher
+
+
+def get_dispatcher():
+    return _dispatcher
+
+
+def backends_in_use():
+    """The active backend followed by every backend voices are assigned to."""
+    backends = [get_backend()]
+    for name in dict.fromkeys(_voices.values()):
+        if backend_named(name) not in backends:
+            backends.append(backend_named(name))
+    return backends
@@ -0,0 +1,140 @@
+import asyncio
+import csv
+import functools
+import io
+import json
+import os
+import re
+import threading
+import time
+import zipfile
+
+from .formats import DEFAULT_FORMAT
+from .merge import run_in_merge_pool
+from .pipeline import synthesize_chunks
+from .spool import spool
+from .synthesis import generate_audio
+from .text import split_text
+
+
+# Rows rendered at the same time; chunk requests are still gated by the scheduler.
+BATCH_ROWS = int(os.environ.get("TTS_BATCH_ROWS", 4))
+BATCH_FIELDS = ("id", "text", "language", "voice")
+
+
+def read_batch(path):
+    """
+    Rows from a CSV file with an `id,text,language,voice` header, or a JSON
+    list of objects with those keys. Missing ids are numbered from 1.
+    """
+    with open(path, encoding="utf-8-sig") as f:
+        content = f.read()
+    if path.lower().endswith(".json"):
+        records = json.loads(content)
+    else:
+        records = list(csv.DictReader(io.StringIO(content)))
+    rows = []
+    for n, record in enumerate(records, 1):
+        row = {key: str(record.get(key) or "").strip() for key in BATCH_FIELDS}
+        row["id"] = row["id"] or str(n)
+        rows.append(row)
+    return rows
+
+
+def _file_names(rows, suffix):
+    """Unique, filesystem-safe `<id><suffix>` names in row order."""
+    names, seen = [], set()
+    for row in rows:
+        base = re.sub(r"[^\w.-]", "_", row["id"]) or "row"
+        name, n = base, 1
+        while name in seen:
+            n += 1
+            name = f"{base}_{n}"
+        seen.add(name)
+        names.append(name + suffix)
+    return names
+
+
+async def _render(text, voice_id, audio_format):
+    """Synthesize and merge one script in memory. Returns `(audio bytes, info)` or raises."""
+    chunks = split_text(text)
+    parts = [None] * len(chunks)
+    synthesize = functools.partial(generate_audio, output_format=audio_format.edge_format)
+    async for i, audio in synthesize_chunks(chunks, voice_id, synthesize):
+        if not audio:
+            raise RuntimeError(f"chunk {i + 1} failed")
+        parts[i] = audio
+
+    def merge():
+        out = io.BytesIO()
+        info = audio_format.concat(parts, out)
+        return out.getvalue(), info
+
+    return await run_in_merge_pool(merge)
+
+
+async def render_batch(rows, resolve_voice, audio_format=DEFAULT_FORMAT, concurrency=BATCH_ROWS):
+    """
+    Render every row and pack the results into a zip in the spool along with a
+    `manifest.json`. Rows with the same text and voice are synthesized once.
+
+    Yields `(zip path or None, status text)` as rows finish; the zip path is
+    only set on the final update.
+    """
+    started = time.monotonic()
+    names = _file_names(rows, audio_format.suffix)
+    manifest = [dict(row, format=audio_format.edge_format, voice_id=None, file=None, duration=0.0, error=None) for row in rows]
+    lines = []
+
+    groups = {}  # (normalized text, voice id) -> row indexes
+    for i, row in enumerate(rows):
+        voice_id = resolve_voice(row["language"], row["voice"])
+        if not row["text"] or not voice_id:
+            manifest[i]["error"] = "missing text" if not row["text"] else "unknown voice"
+            lines.append(f"❌ {row['id']}: {manifest[i]['error']}")
+            continue
+        manifest[i]["voice_id"] = voice_id
+        groups.setdefault((" ".join(row["text"].split()), voice_id), []).append(i)
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    zip_lock = threading.Lock()
+
+    async def render_group(key, indexes):
+        async with semaphore:
+            try:
+                return key, indexes, await _render(*key, audio_format), None
+            except Exception as e:
+                return key, indexes, None, str(e)
+
+    finished = len(lines)
+    with spool.create("batch", ".zip") as (zip_path, f), zipfile.ZipFile(f, "w", zipfile.ZIP_STORED) as archive:
+
+        def write(name, data):
+            with zip_lock:
+                archive.writestr(name, data)
+
+        tasks = [asyncio.ensure_future(render_group(key, indexes)) for key, indexes in groups.items()]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                key, indexes, result, error = await next_done
+                for i in indexes:
+                    if error:
+                        manifest[i]["error"] = error
+                        lines.append(f"❌ {rows[i]['id']}: {error}")
+                        continue
+                    data, info = result
+                    await run_in_merge_pool(write, names[i], data)
+                    manifest[i].update(file=names[i], duration=round(info.duration, 3))
+                    lines.append(f"✅ {rows[i]['id']} ({info.duration:.1f}s)")
+                finished += len(indexes)
+                yield None, f"📦 {finished}/{len(rows)} rows\n" + "\n".join(lines[-10:])
+        finally:
+            for task in tasks:
+                task.cancel()
+        write("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2))
+
+    elapsed = time.monotonic() - started
+    ok = sum(1 for entry in manifest if entry["file"])
+    rate = ok / elapsed * 60 if elapsed else 0.0
+    yield zip_path, (f"📦 Done: {ok}/{len(rows)} rows ({len(groups)} unique) in {elapsed:.1f}s, "
+                     f"{rate:.1f} rows/min\n" + "\n".join(lines[-10:]))
@@ -0,0 +1,109 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+
+def cache_key(text, voice_id, output_format):
+    """Content address for one synthesized chunk: whitespace-normalized text, voice and format."""
+    normalized = " ".join(text.split())
+    return hashlib.sha256("\x00".join((normalized, voice_id, output_format)).encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """
+    On-disk cache of synthesized audio with an LRU size quota.
+
+    Files live in `root` named by their content key. An in-memory index keeps
+    the LRU order and sizes, so lookups never touch the disk; it is rebuilt
+    from file mtimes on startup, which `get` refreshes on every hit.
+    """
+
+    def __init__(self, root, max_bytes, suffix=".mp3"):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        self._index = OrderedDict()  # key -> size in bytes, least recently used first
+        self._total = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._load()
+
+    def _path(self, key):
+        return os.path.join(self.root, key + self.suffix)
+
+    def _load(self):
+        entries = []
+        for name in os.listdir(self.root):
+            if not name.endswith(self.suffix):
+                continue
+            stat = os.stat(os.path.join(self.root, name))
+            entries.append((stat.st_mtime, name[:-len(self.suffix)], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total += size
+        self._evict()
+
+    def _evict(self):
+        # The most recent entry is always kept, even if it alone exceeds the quota.
+        while self._total > self.max_bytes and len(self._index) > 1:
+            key, size = self._index.popitem(last=False)
+            self._total -= size
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def get(self, text, voice_id, output_format):
+        """Return the cached audio bytes for this chunk, or None."""
+        key = cache_key(text, voice_id, output_format)
+        with self._lock:
+            if key not in self._index:
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+            self.hits += 1
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            # Removed behind our back; forget it and report a miss.
+            with self._lock:
+                self._total -= self._index.pop(key, 0)
+                self.hits -= 1
+                self.misses += 1
+            return None
+        return data
+
+    def put(self, text, voice_id, output_format, data):
+        """Store freshly synthesized audio bytes. The file appears atomically."""
+        key = cache_key(text, voice_id, output_format)
+        path = self._path(key)
+        partial = f"{path}.{threading.get_ident()}.part"
+        with open(partial, "wb") as f:
+            f.write(data)
+        os.replace(partial, path)
+        with self._lock:
+            self._total += len(data) - self._index.pop(key, 0)
+            self._index[key] = len(data)
+            self._evict()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._index),
+                "bytes": self._total,
+            }
+
+    def summary(self):
+        s = self.stats()
+        return (f"{s['hits']} hits / {s['misses']} misses ({s['hit_ratio']:.0%}), "
+                f"{s['entries']} files, {s['bytes'] / 1e6:.1f} MB")
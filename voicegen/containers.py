@@ -0,0 +1,297 @@
+"""
+Byte-level joining for the non-MP3 output formats: Ogg Opus, WebM Opus and
+raw PCM (written as WAV). Chunks are stitched at the container level and the
+codec data is copied untouched, like `concat_mp3` does for MP3.
+
+Each joiner is incremental: `add(chunk)` returns the bytes to append for the
+next chunk, which is also what the live player streams.
+"""
+import struct
+import zlib
+from dataclasses import dataclass
+
+
+@dataclass
+class AudioInfo:
+    frames: int = 0  # Ogg pages, WebM blocks or PCM samples
+    duration: float = 0.0
+
+
+# --- Ogg Opus ---------------------------------------------------------------
+
+# Ogg's CRC is CRC-32 without reflection; zlib's CRC-32 is the reflected
+# variant, so run it over bit-reversed bytes and reverse the result.
+_REVERSED_BITS = bytes(int(f"{i:08b}"[::-1], 2) for i in range(256))
+
+
+def _ogg_crc(page):
+    crc = zlib.crc32(bytes(page).translate(_REVERSED_BITS), 0xFFFFFFFF) ^ 0xFFFFFFFF
+    return int(f"{crc:032b}"[::-1], 2)
+
+
+def _ogg_pages(data):
+    """Yield `(start, end, header_length)` for every complete page in `data`."""
+    pos = data.find(b"OggS")
+    while 0 <= pos and pos + 27 <= len(data):
+        segments = data[pos + 26]
+        header_length = 27 + segments
+        end = pos + header_length + sum(data[pos + 27:pos + header_length])
+        if end > len(data):
+            return
+        yield pos, end, header_length
+        pos = data.find(b"OggS", end)
+
+
+class OggJoiner:
+    """
+    Joins Ogg Opus files into one logical stream. The first chunk's OpusHead
+    and OpusTags pages are kept, later chunks' are dropped, and every page is
+    rewritten with one serial number, continuous sequence numbers and granule
+    positions offset by the audio that came before it.
+
+    Later chunks' pre-skip samples are still decoded at each join (Ogg Opus
+    only allows trimming at the start and end of a stream), so granules keep
+    counting them; `info.duration` leaves every chunk's pre-skip out.
+    """
+
+    HEADER_PACKETS = 2  # OpusHead, OpusTags
+    GRANULE_RATE = 48000  # Opus granule positions always count 48 kHz samples
+
+    def __init__(self):
+        self.info = AudioInfo()
+        self._serial = None
+        self._sequence = 0
+        self._offset = 0  # granule position where the next chunk starts
+        self._pre_skip = 0  # samples of encoder pre-roll across all chunks so far
+
+    def add(self, data, last=False):
+        first = self._serial is None
+        headers = self.HEADER_PACKETS
+        pages, end_granule = [], 0
+        for start, end, header_length in _ogg_pages(data):
+            page = bytearray(data[start:end])
+            in_headers = headers > 0
+            if in_headers:
+                if page[header_length:header_length + 8] == b"OpusHead":
+                    self._pre_skip += struct.unpack_from("<H", page, header_length + 10)[0]
+                    if first:
+                        self._serial = struct.unpack_from("<I", page, 14)[0]
+                # A lacing value below 255 ends a packet.
+                headers -= sum(1 for value in page[27:header_length] if value < 255)
+                if not first:
+                    continue
+            granule = struct.unpack_from("<q", page, 6)[0]
+            if granule != -1 and not in_headers:
+                end_granule = granule
+                struct.pack_into("<q", page, 6, granule + self._offset)
+            page[5] &= ~0x04  # end of stream only on the very last page
+            struct.pack_into("<II", page, 14, self._serial or 0, self._sequence)
+            self._sequence += 1
+            pages.append(page)
+        if last and pages:
+            pages[-1][5] |= 0x04
+        for page in pages:
+            struct.pack_into("<I", page, 22, 0)
+            struct.pack_into("<I", page, 22, _ogg_crc(page))
+        self._offset += end_granule
+        self.info.frames += len(pages)
+        self.info.duration = max(0, self._offset - self._pre_skip) / self.GRANULE_RATE
+        return b"".join(pages)
+
+
+def concat_ogg(parts, out):
+    """Write every Ogg Opus file in `parts` to `out` as one stream. Returns an `AudioInfo`."""
+    joiner = OggJoiner()
+    for i, data in enumerate(parts):
+        out.write(joiner.add(data, last=i == len(parts) - 1))
+    return joiner.info
+
+
+# --- WebM Opus --------------------------------------------------------------
+
+_EBML = 0x1A45DFA3
+_SEGMENT = 0x18538067
+_INFO = 0x1549A966
+_TRACKS = 0x1654AE6B
+_CLUSTER = 0x1F43B675
+_TIMECODE_SCALE = 0x2AD7B1
+_DURATION = 0x4489
+_TIMECODE = 0xE7
+_POSITION = 0xA7
+_PREV_SIZE = 0xAB
+_SIMPLE_BLOCK = 0xA3
+_BLOCK_GROUP = 0xA0
+_BLOCK = 0xA1
+# Elements that can only appear at the top level of a segment.
+_LEVEL1 = {_EBML, _SEGMENT, _INFO, _TRACKS, _CLUSTER, 0x114D9B74, 0x1C53BB6B, 0x1254C367, 0x1043A770, 0x1941A469}
+_UNKNOWN_SIZE = b"\x01\xff\xff\xff\xff\xff\xff\xff"
+_DEFAULT_FRAME_NS = 20_000_000  # Opus frame length, used when a chunk has a single block
+
+
+def _vint(data, pos, marker):
+    """Read an EBML variable-size integer. Returns `(value, length, all_ones)`."""
+    first = data[pos]
+    length = 9 - first.bit_length()
+    if not 1 <= length <= 8:
+        raise ValueError("invalid EBML integer")
+    value = first if marker else first & (0xFF >> length)
+    for byte in data[pos + 1:pos + length]:
+        value = (value << 8) | byte
+    return value, length, value == (1 << 7 * length) - 1
+
+
+def _children(data, start, end):
+    """Yield `(id, element_start, data_start, data_end)` for the elements in `data[start:end]`."""
+    pos = start
+    while pos < end:
+        element_id, id_length, _ = _vint(data, pos, True)
+        size, size_length, unknown = _vint(data, pos + id_length, False)
+        data_start = pos + id_length + size_length
+        if unknown:
+            # Runs until an element that can't be its child: a new segment, or a top-level element for a cluster
+            stop = (_EBML, _SEGMENT) if element_id == _SEGMENT else _LEVEL1
+            data_end = data_start
+            while data_end < end and _vint(data, data_end, True)[0] not in stop:
+                data_end = next(_children(data, data_end, end))[3]
+        else:
+            data_end = min(end, data_start + size)
+        yield element_id, pos, data_start, data_end
+        pos = data_end
+
+
+def _element(element_id, payload):
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, "big") + (
+        (1 << 56) | len(payload)).to_bytes(8, "big") + payload
+
+
+def _uint(data, start, end):
+    return int.from_bytes(data[start:end], "big")
+
+
+def _block_time(data, start):
+    """Relative timecode of a (Simple)Block whose payload starts at `start`."""
+    track_length = _vint(data, start, False)[1]
+    return struct.unpack_from(">h", data, start + track_length)[0]
+
+
+class WebmJoiner:
+    """
+    Joins WebM files into one segment of unknown size. The first chunk's
+    Info and Tracks are kept; clusters from every chunk are re-emitted with
+    timecodes offset by the audio that came before them. Cues and SeekHead
+    are dropped because their byte positions no longer hold.
+
+    With `duration_slot` the Info gets a Duration placeholder at byte
+    `duration_at` of the output, for `concat_webm` to fill in at the end.
+    """
+
+    def __init__(self, duration_slot=False):
+        self.info = AudioInfo()
+        self.duration_slot = duration_slot
+        self.duration_at = None
+        self._scale = 1_000_000  # ns per timecode tick
+        self.ticks = 0  # length of everything added so far, in timecode ticks
+        self._started = False
+
+    def _head(self, data, data_start, data_end, header):
+        """EBML header, open-ended Segment and the first chunk's Info, without its Duration."""
+        out = bytearray(header + _SEGMENT.to_bytes(4, "big") + _UNKNOWN_SIZE)
+        info = bytearray()
+        for child_id, child_start, child_data, child_end in _children(data, data_start, data_end):
+            if child_id == _TIMECODE_SCALE:
+                self._scale = _uint(data, child_data, child_end)
+            if child_id != _DURATION:
+                info += data[child_start:child_end]
+        if self.duration_slot:
+            # Info id (4) and size (8), then the Duration id (2) and size (8)
+            self.duration_at = len(out) + 12 + len(info) + 10
+            info += _element(_DURATION, struct.pack(">d", 0.0))
+        out += _element(_INFO, bytes(info))
+        return out
+
+    def add(self, data, last=False):
+        out = bytearray()
+        header = b""
+        last_time, gap = None, _DEFAULT_FRAME_NS // self._scale
+        for element_id, _, data_start, data_end in _children(data, 0, len(data)):
+            if element_id == _EBML:
+                header = bytes(data[:data_end])
+            if element_id != _SEGMENT:
+                continue
+            for child_id, child_start, child_data, child_end in _children(data, data_start, data_end):
+                if child_id == _INFO and not self._started:
+                    out += self._head(data, child_data, child_end, header)
+                elif child_id == _TRACKS and not self._started:
+                    out += data[child_start:child_end]
+                    self._started = True
+                elif child_id == _CLUSTER:
+                    cluster_time, blocks = 0, bytearray()
+                    for block_id, block_start, block_data, block_end in _children(data, child_data, child_end):
+                        if block_id == _TIMECODE:
+                            cluster_time = _uint(data, block_data, block_end)
+                            continue
+                        if block_id in (_POSITION, _PREV_SIZE):
+                            continue
+                        blocks += data[block_start:block_end]
+                        if block_id == _BLOCK_GROUP:
+                            block_data = next((s for i, _, s, _ in _children(data, block_data, block_end) if i == _BLOCK), None)
+                        if block_id in (_SIMPLE_BLOCK, _BLOCK_GROUP) and block_data is not None:
+                            time = cluster_time + _block_time(data, block_data)
+                            if last_time is not None and time > last_time:
+                                gap = time - last_time
+                            last_time = time
+                            self.info.frames += 1
+                    timecode = (cluster_time + self.ticks).to_bytes(8, "big").lstrip(b"\x00") or b"\x00"
+                    out += _element(_CLUSTER, _element(_TIMECODE, timecode) + bytes(blocks))
+        if last_time is not None:
+            self.ticks += last_time + gap
+        self.info.duration = self.ticks * self._scale / 1e9
+        return bytes(out)
+
+
+def concat_webm(parts, out):
+    """Write every WebM file in `parts` to the seekable `out` as one file. Returns an `AudioInfo`."""
+    joiner = WebmJoiner(duration_slot=True)
+    for data in parts:
+        out.write(joiner.add(data))
+    if joiner.duration_at is not None:
+        end = out.tell()
+        out.seek(joiner.duration_at)
+        out.write(struct.pack(">d", float(joiner.ticks)))
+        out.seek(end)
+    return joiner.info
+
+
+# --- Raw PCM ----------------------------------------------------------------
+
+def wav_header(sample_rate, data_length=None, channels=1, bits=16):
+    """A 44-byte WAV header; without `data_length` the sizes are left open for streaming."""
+    block = channels * bits // 8
+    riff_size = 0xFFFFFFFF if data_length is None else 36 + data_length
+    data_size = 0xFFFFFFFF if data_length is None else data_length
+    return (b"RIFF" + struct.pack("<I", riff_size) + b"WAVEfmt "
+            + struct.pack("<IHHIIHH", 16, 1, channels, sample_rate, sample_rate * block, block, bits)
+            + b"data" + struct.pack("<I", data_size))
+
+
+class PcmJoiner:
+    """Streams raw 16-bit mono PCM chunks as one open-ended WAV."""
+
+    def __init__(self, sample_rate):
+        self.sample_rate = sample_rate
+        self.info = AudioInfo()
+
+    def add(self, data, last=False):
+        header = b"" if self.info.frames else wav_header(self.sample_rate)
+        self.info.frames += len(data) // 2
+        self.info.duration = self.info.frames / self.sample_rate
+        return header + bytes(data)
+
+
+def concat_pcm(parts, out, sample_rate):
+    """Write raw 16-bit mono PCM `parts` to `out` as one WAV file. Returns an `AudioInfo`."""
+    length = sum(len(data) for data in parts)
+    out.write(wav_header(sample_rate, length))
+    for data in parts:
+        out.write(data)
+    return AudioInfo(length // 2, length / 2 / sample_rate)
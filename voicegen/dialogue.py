@@ -0,0 +1,136 @@
+"""
+Dialogue scripts: speaker-tagged lines, each spoken in its speaker's voice.
+
+    Alice = 👩 Jenny
+    Bob = en-US-GuyNeural
+
+    Alice: Welcome back to the show.
+    Bob: Thanks, glad to be here.
+    It's been a while.
+
+`Speaker = voice` lines cast a speaker (voice label or id). `Name:` starts
+a line when the name is cast, or is a single word that tags more than one
+line (so a lone "Note:" or "Warning:" isn't taken for a speaker); any other
+line continues the previous speaker, and text before the first tag is the
+narrator's.
+Every line's chunks go through one `synthesize_chunks` call, so all
+speakers are synthesized in parallel, and a gap of silence is put between
+lines when they are joined.
+"""
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+
+from .silence import silence
+from .text import split_text
+
+
+# Seconds of silence between two lines.
+DIALOGUE_GAP = float(os.environ.get("TTS_DIALOGUE_GAP", 0.4))
+NARRATOR = ""
+
+_CAST_RE = re.compile(r"^\s*([^\W\d][\w .'-]{0,39}?)\s*=\s*(\S.*?)\s*$")
+_LINE_RE = re.compile(r"^\s*([^\W\d][\w .'-]{0,39}?)\s*:(?!//)\s*(.*?)\s*$")  # not "https://..."
+
+
+@dataclass
+class DialogueLine:
+    speaker: str
+    text: str
+
+
+def _is_speaker(name, cast, tags):
+    """A tag names a speaker when it is cast, or is one word (not "The agenda is simple") used more than once."""
+    return name in cast or (" " not in name and tags[name] > 1)
+
+
+def parse_dialogue(script):
+    """`(cast, lines)`: the speaker -> voice entries and the spoken lines in order."""
+    raws = [raw for raw in script.splitlines() if raw.strip() and not raw.lstrip().startswith("#")]
+    cast = {}
+    for raw in raws:
+        found = _CAST_RE.match(raw)
+        if found:
+            cast[found.group(1)] = found.group(2)
+    spoken = [raw for raw in raws if not _CAST_RE.match(raw)]
+    tags = Counter(found.group(1) for found in map(_LINE_RE.match, spoken) if found)
+    lines = []
+    for raw in spoken:
+        found = _LINE_RE.match(raw)
+        if found and _is_speaker(found.group(1), cast, tags):
+            lines.append(DialogueLine(found.group(1), found.group(2)))
+        elif lines:
+            lines[-1].text += "\n" + raw.strip()
+        else:
+            lines.append(DialogueLine(NARRATOR, raw.strip()))
+    return cast, [line for line in lines if line.text.strip()]
+
+
+def cast_voices(cast, lines, resolve, default_voice, spare_voices=()):
+    """
+    Voice id per speaker. Cast entries go through `resolve(voice)`; the
+    narrator and the first uncast speaker get `default_voice`, later uncast
+    speakers the next unused of `spare_voices`. Raises ValueError for a cast
+    voice that doesn't resolve or when voices run out.
+    """
+    voices = {}
+    for speaker, voice in cast.items():
+        voices[speaker] = resolve(voice)
+        if not voices[speaker]:
+            raise ValueError(f"Unknown voice for {speaker or 'the narrator'}: {voice}")
+    spare = [v for v in dict.fromkeys([default_voice, *spare_voices]) if v and v not in voices.values()]
+    for line in lines:
+        if line.speaker in voices:
+            continue
+        if line.speaker == NARRATOR and default_voice:
+            voices[line.speaker] = default_voice
+        elif spare:
+            voices[line.speaker] = spare.pop(0)
+        else:
+            raise ValueError(f"No voice left for {line.speaker}; cast it with `{line.speaker} = <voice>`")
+    return voices
+
+
+@dataclass
+class DialoguePlan:
+    """The chunks of every line in order, with each chunk's voice and line number."""
+
+    chunks: list = field(default_factory=list)
+    voices: list = field(default_factory=list)
+    lines: list = field(default_factory=list)
+    speakers: dict = field(default_factory=dict)  # speaker -> voice id, in order of appearance
+
+    @classmethod
+    def build(cls, lines, voices):
+        plan = cls(speakers={line.speaker: voices[line.speaker] for line in lines})
+        for number, line in enumerate(lines):
+            for chunk in split_text(line.text):
+                plan.chunks.append(chunk)
+                plan.voices.append(voices[line.speaker])
+                plan.lines.append(number)
+        return plan
+
+    def summary(self):
+        """Who speaks in which voice, for the status line, so a misread tag is easy to spot."""
+        return ", ".join(f"{speaker or 'Narrator'} → {voice}" for speaker, voice in self.speakers.items())
+
+    def with_gaps(self, start, parts, gap_audio):
+        """`parts` (chunk audio from index `start` on) with `gap_audio` wherever a new line begins."""
+        for i, part in enumerate(parts, start):
+            if i and gap_audio and self.lines[i] != self.lines[i - 1]:
+                yield gap_audio
+            yield part
+
+
+def gap_audio(seconds, output_format):
+    """The silence put between lines, or b"" for no gap."""
+    return silence(seconds, output_format) if seconds > 0 else b""
+
+
+def plan_dialogue(script, resolve, default_voice, spare_voices=()):
+    """Parse and cast `script` in one go (see `parse_dialogue` and `cast_voices`)."""
+    cast, lines = parse_dialogue(script)
+    if not lines:
+        raise ValueError("The script has no lines to speak.")
+    return DialoguePlan.build(lines, cast_voices(cast, lines, resolve, default_voice, spare_voices))
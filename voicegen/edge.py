@@ -0,0 +1,224 @@
+import asyncio
+import os
+import ssl
+import time
+from xml.sax.saxutils import escape
+
+import aiohttp
+import certifi
+import edge_tts
+from edge_tts.communicate import (
+    calc_max_mesg_size,
+    connect_id,
+    date_to_string,
+    get_headers_and_data,
+    mkssml,
+    remove_incompatible_characters,
+    split_text_by_byte_length,
+    ssml_headers_plus_data,
+)
+from edge_tts.constants import WSS_URL
+from edge_tts.exceptions import NoAudioReceived, UnexpectedResponse, UnknownResponse, WebSocketError
+
+from .logs import logger
+from .metrics import Counter
+
+
+# The format edge-tts produces; part of the cache key.
+OUTPUT_FORMAT = "audio-24khz-48kbitrate-mono-mp3"
+
+# Idle connections kept open per output format.
+POOL_SIZE = int(os.environ.get("TTS_EDGE_POOL_SIZE", 4))
+# The service drops quiet sockets; anything idle longer than this is reopened.
+IDLE_TIMEOUT = float(os.environ.get("TTS_EDGE_IDLE_TIMEOUT", 20))
+RECEIVE_TIMEOUT = 10
+# Point at a stand-in server (see `voicegen.fake_edge`) for load tests.
+EDGE_URL = os.environ.get("TTS_EDGE_URL", WSS_URL)
+
+# Same headers edge-tts sends, so the service sees an ordinary Edge client.
+_HEADERS = {
+    "Pragma": "no-cache",
+    "Cache-Control": "no-cache",
+    "Origin": "chrome-extension://jdiccldimpdaibmpdkjnbmckianbfold",
+    "Accept-Encoding": "gzip, deflate, br",
+    "Accept-Language": "en-US,en;q=0.9",
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+    " (KHTML, like Gecko) Chrome/91.0.4472.77 Safari/537.36 Edg/91.0.864.41",
+}
+
+_SSL_CONTEXT = ssl.create_default_context(cafile=certifi.where())
+
+
+class EdgeConnection:
+    """
+    One websocket to the Edge read-aloud service. The speech config is sent
+    once on connect; after that every synthesis is just SSML turns, so reusing
+    the connection skips DNS, TCP, TLS and the websocket upgrade.
+    """
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.last_used = time.monotonic()
+
+    @classmethod
+    async def open(cls, session, url, output_format):
+        websocket = await session.ws_connect(
+            f"{url}{'&' if '?' in url else '?'}ConnectionId={connect_id()}",
+            compress=15,
+            headers=_HEADERS,
+            ssl=_SSL_CONTEXT,
+        )
+        await websocket.send_str(
+            f"X-Timestamp:{date_to_string()}\r\n"
+            "Content-Type:application/json; charset=utf-8\r\n"
+            "Path:speech.config\r\n\r\n"
+            '{"context":{"synthesis":{"audio":{"metadataoptions":{'
+            '"sentenceBoundaryEnabled":false,"wordBoundaryEnabled":true},'
+            f'"outputFormat":"{output_format}"'
+            "}}}}\r\n"
+        )
+        return cls(websocket)
+
+    @property
+    def usable(self):
+        return not self.websocket.closed and time.monotonic() - self.last_used < IDLE_TIMEOUT
+
+    async def synthesize(self, communicate):
+        """Synthesize the text of an `edge_tts.Communicate` and return the audio bytes."""
+        texts = split_text_by_byte_length(
+            escape(remove_incompatible_characters(communicate.text)),
+            calc_max_mesg_size(communicate.voice, communicate.rate, communicate.volume, communicate.pitch),
+        )
+        audio = []
+        for text in texts:
+            await self.websocket.send_str(
+                ssml_headers_plus_data(
+                    connect_id(),
+                    date_to_string(),
+                    mkssml(text, communicate.voice, communicate.rate, communicate.volume, communicate.pitch),
+                )
+            )
+            await self._receive_turn(audio)
+        if not audio:
+            raise NoAudioReceived("No audio was received. Please verify that your parameters are correct.")
+        self.last_used = time.monotonic()
+        return b"".join(audio)
+
+    async def _receive_turn(self, audio):
+        while True:
+            received = await self.websocket.receive(timeout=RECEIVE_TIMEOUT)
+            if received.type == aiohttp.WSMsgType.TEXT:
+                path = get_headers_and_data(received.data)[0].get(b"Path")
+                if path == b"turn.end":
+                    return
+                if path not in (b"response", b"turn.start", b"audio.metadata"):
+                    raise UnknownResponse("The response from the service is not recognized.\n" + received.data)
+            elif received.type == aiohttp.WSMsgType.BINARY:
+                if len(received.data) < 2:
+                    raise UnexpectedResponse("We received a binary message, but it is missing the header length.")
+                header_length = int.from_bytes(received.data[:2], "big")
+                if len(received.data) < header_length + 2:
+                    raise UnexpectedResponse("We received a binary message, but it is missing the audio data.")
+                audio.append(received.data[header_length + 2:])
+            else:
+                raise WebSocketError(str(received.data) if received.data else "Connection closed by the service")
+
+    async def close(self):
+        await self.websocket.close()
+
+
+class EdgePool:
+    """
+    Warm, reusable connections to edge-tts, keyed by output format.
+
+    Must only be used from one event loop (the service loop). A request that
+    fails on a reused connection is retried once on a fresh one, since the
+    service may have dropped the socket while it sat idle; the other idle
+    connections for that format are discarded at the same time.
+    """
+
+    def __init__(self, size=POOL_SIZE, url=EDGE_URL):
+        self.size = size
+        self.url = url
+        self.opened = 0
+        self.reused = 0
+        self._idle = {}
+        self._session = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(trust_env=True)
+        return self._session
+
+    async def _acquire(self, output_format):
+        idle = self._idle.setdefault(output_format, [])
+        while idle:
+            connection = idle.pop()
+            if connection.usable:
+                self.reused += 1
+                return connection, True
+            await connection.close()
+        self.opened += 1
+        return await EdgeConnection.open(self._get_session(), self.url, output_format), False
+
+    async def _release(self, connection, output_format):
+        idle = self._idle.setdefault(output_format, [])
+        if connection.usable and len(idle) < self.size:
+            idle.append(connection)
+        else:
+            await connection.close()
+
+    async def _drop_idle(self, output_format):
+        idle = self._idle.pop(output_format, [])
+        for connection in idle:
+            await connection.close()
+
+    async def synthesize(self, text, voice_id, output_format=OUTPUT_FORMAT):
+        # Communicate validates the parameters and expands the voice name.
+        communicate = edge_tts.Communicate(text, voice=voice_id)
+        for attempt in range(2):
+            connection, reused = await self._acquire(output_format)
+            try:
+                audio = await connection.synthesize(communicate)
+            except (aiohttp.ClientError, asyncio.TimeoutError, WebSocketError, ConnectionError):
+                await connection.close()
+                if reused and attempt == 0:
+                    # Its idle siblings are most likely dead too.
+                    await self._drop_idle(output_format)
+                    continue
+                raise
+            except BaseException:
+                await connection.close()
+                raise
+            await self._release(connection, output_format)
+            return audio
+
+    async def warm(self, output_format=OUTPUT_FORMAT, count=None):
+        """Open connections ahead of the first request so it skips the handshake."""
+        count = self.size if count is None else count
+        idle = self._idle.setdefault(output_format, [])
+        missing = max(0, count - len(idle))
+        results = await asyncio.gather(
+            *(EdgeConnection.open(self._get_session(), self.url, output_format) for _ in range(missing)),
+            return_exceptions=True,
+        )
+        for connection in results:
+            if isinstance(connection, EdgeConnection):
+                self.opened += 1
+                await self._release(connection, output_format)
+            else:
+                logger.warning("edge_warm_up_failed", extra={"error": repr(connection)})
+        return len(idle)
+
+    async def close(self):
+        """Close every idle connection and the session, e.g. before the loop stops."""
+        for output_format in list(self._idle):
+            await self._drop_idle(output_format)
+        if self._session is not None:
+            await self._session.close()
+
+
+edge_pool = EdgePool()
+
+Counter("tts_edge_connections_total", "Edge websockets by whether they were newly opened or reused.", ["state"],
+        fn=lambda: {("opened",): edge_pool.opened, ("reused",): edge_pool.reused})
@@ -0,0 +1,120 @@
+"""
+A local stand-in for the Edge read-aloud websocket, for load tests.
+
+It speaks the same protocol as the real service (speech.config, SSML turns,
+framed binary audio) and answers with silent audio of a plausible length in
+the requested output format, after a configurable latency with jitter and
+with a configurable share of dropped connections. Point the app at it with
+TTS_EDGE_URL:
+
+    python -m voicegen.fake_edge --port 8765 --latency 0.3 --jitter 0.1 --error-rate 0.02
+    TTS_EDGE_URL=ws://127.0.0.1:8765/edge python app.py
+"""
+import argparse
+import asyncio
+import random
+import re
+
+import aiohttp
+from aiohttp import web
+
+from .silence import silence
+
+
+CHARS_PER_SECOND = 15  # rough speaking rate, sets how much audio a chunk produces
+MESSAGE_BYTES = 4096  # audio payload per websocket message, like the real service
+
+
+def fake_audio(text, output_format):
+    """Silent audio in `output_format` lasting about as long as `text` takes to read."""
+    return silence(max(0.5, len(text) / CHARS_PER_SECOND), output_format)
+
+
+class FakeEdgeServer:
+    """
+    `latency` (± uniform `jitter`) passes between a turn starting and its
+    first audio; the audio then streams at `speed` times real time. A share
+    `error_rate` of turns has its connection closed instead of answered.
+    """
+
+    def __init__(self, latency=0.3, jitter=0.1, error_rate=0.0, speed=10.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.speed = speed
+        self.connections = 0
+        self.turns = 0
+        self.errors = 0
+        self._runner = None
+
+    async def handle(self, request):
+        websocket = web.WebSocketResponse()
+        await websocket.prepare(request)
+        self.connections += 1
+        output_format = "audio-24khz-48kbitrate-mono-mp3"
+        async for message in websocket:
+            if message.type != aiohttp.WSMsgType.TEXT:
+                continue
+            if "Path:speech.config" in message.data:
+                found = re.search(r'"outputFormat":"([^"]+)"', message.data)
+                output_format = found.group(1) if found else output_format
+            elif "Path:ssml" in message.data:
+                if not await self._turn(websocket, message.data, output_format):
+                    break
+        return websocket
+
+    async def _turn(self, websocket, message, output_format):
+        self.turns += 1
+        request_id = re.search(r"X-RequestId:(\w+)", message).group(1)
+        text = re.sub(r"<[^>]+>", "", message.split("\r\n\r\n", 1)[-1]).strip()
+        await websocket.send_str(f"X-RequestId:{request_id}\r\nPath:turn.start\r\n\r\n{{}}")
+        await asyncio.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        if random.random() < self.error_rate:
+            self.errors += 1
+            await websocket.close(code=aiohttp.WSCloseCode.INTERNAL_ERROR)
+            return False
+        audio = fake_audio(text, output_format)
+        seconds_per_byte = max(0.5, len(text) / CHARS_PER_SECOND) / len(audio)
+        header = f"X-RequestId:{request_id}\r\nContent-Type:audio\r\nPath:audio\r\n".encode()
+        for start in range(0, len(audio), MESSAGE_BYTES):
+            piece = audio[start:start + MESSAGE_BYTES]
+            await websocket.send_bytes(len(header).to_bytes(2, "big") + header + piece)
+            await asyncio.sleep(len(piece) * seconds_per_byte / self.speed)
+        await websocket.send_str(f"X-RequestId:{request_id}\r\nPath:turn.end\r\n\r\n{{}}")
+        return True
+
+    async def start(self, host="127.0.0.1", port=8765):
+        """Start serving and return the URL to use as TTS_EDGE_URL."""
+        app = web.Application()
+        app.router.add_get("/edge", self.handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        return f"ws://{host}:{port}/edge"
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the edge-tts websocket service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds until the first audio")
+    parser.add_argument("--jitter", type=float, default=0.1, help="± seconds added to the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of turns answered by a dropped connection")
+    parser.add_argument("--speed", type=float, default=10.0, help="audio streamed per second, as a multiple of real time")
+    args = parser.parse_args()
+
+    async def serve():
+        server = FakeEdgeServer(args.latency, args.jitter, args.error_rate, args.speed)
+        url = await server.start(args.host, args.port)
+        print(f"✅ Fake edge-tts listening; run the app with TTS_EDGE_URL={url}")
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
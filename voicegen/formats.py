@@ -0,0 +1,66 @@
+from dataclasses import dataclass
+
+from .containers import OggJoiner, PcmJoiner, WebmJoiner, concat_ogg, concat_pcm, concat_webm
+from .mp3 import Mp3Joiner, concat_mp3
+
+
+MEDIA_TYPES = {"mp3": "audio/mpeg", "ogg": "audio/ogg", "webm": "audio/webm", "pcm": "audio/wav"}
+
+
+@dataclass(frozen=True)
+class AudioFormat:
+    """
+    An output format edge-tts can produce natively. `edge_format` is sent in
+    the speech config, so the audio arrives in this format and is only joined
+    at the container level, never transcoded.
+    """
+
+    name: str
+    edge_format: str
+    suffix: str
+    container: str  # "mp3", "ogg", "webm" or "pcm"
+    sample_rate: int = 24000
+
+    @property
+    def media_type(self):
+        return MEDIA_TYPES[self.container]
+
+    def joiner(self):
+        """Incremental joiner for the live player; `add(chunk)` returns the bytes to stream next."""
+        if self.container == "ogg":
+            return OggJoiner()
+        if self.container == "webm":
+            return WebmJoiner()
+        if self.container == "pcm":
+            return PcmJoiner(self.sample_rate)
+        return Mp3Joiner()
+
+    def concat(self, parts, out):
+        """Join chunk audio into the binary file `out`. Returns an info object with `duration`."""
+        if self.container == "ogg":
+            return concat_ogg(parts, out)
+        if self.container == "webm":
+            return concat_webm(parts, out)
+        if self.container == "pcm":
+            return concat_pcm(parts, out, self.sample_rate)
+        return concat_mp3(parts, out)
+
+
+FORMATS = {
+    audio_format.name: audio_format
+    for audio_format in (
+        AudioFormat("MP3 · 48 kbps", "audio-24khz-48kbitrate-mono-mp3", ".mp3", "mp3"),
+        AudioFormat("MP3 · 32 kbps (smaller)", "audio-16khz-32kbitrate-mono-mp3", ".mp3", "mp3", 16000),
+        AudioFormat("Opus · Ogg (smallest)", "ogg-24khz-16bit-mono-opus", ".ogg", "ogg"),
+        AudioFormat("Opus · WebM (smallest)", "webm-24khz-16bit-mono-opus", ".webm", "webm"),
+        AudioFormat("WAV · raw PCM 24 kHz", "raw-24khz-16bit-mono-pcm", ".wav", "pcm"),
+    )
+}
+DEFAULT_FORMAT = FORMATS["MP3 · 48 kbps"]
+
+
+def get_format(name):
+    """Look a format up by its UI name or its edge-tts name; unknown names give the default."""
+    if name in FORMATS:
+        return FORMATS[name]
+    return next((f for f in FORMATS.values() if f.edge_format == name), DEFAULT_FORMAT)
@@ -0,0 +1,259 @@
+import asyncio
+import datetime
+import functools
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+
+from .formats import DEFAULT_FORMAT, get_format
+from .logs import request_id
+from .merge import merge_chunks_async
+from .metrics import Gauge
+from .pipeline import synthesize_chunks
+from .service_loop import service_loop
+from .spool import Spool
+from .synthesis import generate_audio
+from .text import rechunk, split_text
+
+
+JOBS_DIR = os.environ.get("TTS_JOBS_DIR", os.path.join(tempfile.gettempdir(), "voicegen-jobs"))
+JOB_TTL = int(os.environ.get("TTS_JOB_TTL", 24 * 3600))  # seconds a finished job is kept
+JOB_WORKERS = int(os.environ.get("TTS_JOB_WORKERS", 2))  # jobs synthesized at the same time
+JOB_RESULTS_MAX_BYTES = int(os.environ.get("TTS_JOB_RESULTS_MAX_MB", 2048)) * 1024 * 1024
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+@dataclass
+class Job:
+    id: str
+    text: str
+    voice_id: str
+    chunks: list
+    output_format: str = DEFAULT_FORMAT.edge_format
+    status: str = QUEUED
+    done: list = field(default_factory=list)  # indexes of checkpointed chunks
+    failed: list = field(default_factory=list)
+    result_path: str = None
+    duration: float = 0.0
+    error: str = None
+    created: float = field(default_factory=time.time)
+    updated: float = field(default_factory=time.time)
+    revision_of: str = None  # job whose unchanged chunks this one reuses
+    reused: int = 0
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+    def describe(self):
+        """One status line for the UI."""
+        progress = f"{len(self.done)}/{len(self.chunks)} chunks"
+        if self.status == DONE:
+            return f"✅ Job {self.id} done! Total duration: {datetime.timedelta(seconds=int(self.duration))}"
+        if self.status == FAILED:
+            return f"❌ Job {self.id} failed ({progress}): {self.error}"
+        if self.status == RUNNING:
+            return f"🔄 Job {self.id} running: {progress}"
+        if self.revision_of:
+            return f"🕒 Job {self.id} queued ({len(self.chunks)} chunks, {self.reused} unchanged from job {self.revision_of})"
+        return f"🕒 Job {self.id} queued ({len(self.chunks)} chunks)"
+
+
+class JobManager:
+    """
+    Long scripts synthesized in the background, independent of any browser session.
+
+    Each job lives in `root/<id>/`: `job.json` holds its state and every
+    finished chunk is checkpointed as `<index>.chunk` before the state is
+    updated. On startup unfinished jobs are picked up again and only the
+    chunks without a checkpoint are synthesized. Checkpoints are kept with
+    the job until it expires, so `revise` can reuse them for an edited
+    script. Results go to their own spool, so they outlive the short-lived
+    interactive outputs.
+    """
+
+    def __init__(self, root, workers=JOB_WORKERS, ttl=JOB_TTL):
+        self.root = root
+        self.ttl = ttl
+        self.results = Spool(os.path.join(root, "results"), ttl, JOB_RESULTS_MAX_BYTES)
+        self._jobs = {}
+        self._workers = workers
+        self._slots = None
+        self._started = False
+        os.makedirs(root, exist_ok=True)
+
+    def _job_dir(self, job_id):
+        return os.path.join(self.root, job_id)
+
+    def _chunk_path(self, job, index):
+        return os.path.join(self._job_dir(job.id), f"{index}.chunk")
+
+    def _save(self, job):
+        job.updated = time.time()
+        path = os.path.join(self._job_dir(job.id), "job.json")
+        with open(path + ".part", "w", encoding="utf-8") as f:
+            json.dump(asdict(job), f)
+        os.replace(path + ".part", path)
+
+    def start(self):
+        """Load existing jobs, resume the unfinished ones and start the cleanup task."""
+        if self._started:
+            return
+        self._started = True
+        self.results.start_janitor()
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name, "job.json")
+            if not os.path.exists(path):
+                continue
+            with open(path, encoding="utf-8") as f:
+                job = Job(**json.load(f))
+            self._jobs[job.id] = job
+            if not job.finished:
+                job.status = QUEUED
+                service_loop.submit(self._run(job))
+        service_loop.submit(self._sweep_forever())
+
+    def submit(self, text, voice_id, output_format=DEFAULT_FORMAT.edge_format):
+        """Queue a new job and return it. Work starts on the service loop."""
+        self.start()
+        job = Job(id=uuid.uuid4().hex[:12], text=text, voice_id=voice_id, chunks=split_text(text),
+                  output_format=output_format)
+        os.makedirs(self._job_dir(job.id), exist_ok=True)
+        self._save(job)
+        self._jobs[job.id] = job
+        service_loop.submit(self._run(job))
+        return job
+
+    def revise(self, job_id, text, voice_id=None, output_format=None):
+        """
+        Queue a job for an edited version of job `job_id`'s script and return
+        it (None for an unknown job). Unchanged chunks keep their boundaries
+        and, in the same voice and format, their checkpointed audio; only the
+        chunks whose text changed are synthesized.
+        """
+        old = self.get(job_id)
+        if old is None:
+            return None
+        self.start()
+        voice_id = voice_id or old.voice_id
+        output_format = output_format or old.output_format
+        chunks, reused = rechunk(old.chunks, text)
+        job = Job(id=uuid.uuid4().hex[:12], text=text, voice_id=voice_id, chunks=chunks,
+                  output_format=output_format, revision_of=old.id, reused=len(reused))
+        os.makedirs(self._job_dir(job.id), exist_ok=True)
+        if (voice_id, output_format) == (old.voice_id, old.output_format):
+            checkpoints = {old.chunks[i]: self._chunk_path(old, i) for i in old.done}
+            for i in reused:
+                source = checkpoints.get(chunks[i])
+                if source and os.path.exists(source):
+                    _link_or_copy(source, self._chunk_path(job, i))
+                    job.done.append(i)
+        self._save(job)
+        self._jobs[job.id] = job
+        service_loop.submit(self._run(job))
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    async def watch(self, job_id, interval=0.5):
+        """Yield the job every time it changes, until it finishes. Safe to use from any event loop."""
+        job = self.get(job_id)
+        if job is None:
+            return
+        seen = None
+        while True:
+            if job.updated != seen:
+                seen = job.updated
+                yield job
+            if job.finished:
+                return
+            await asyncio.sleep(interval)
+
+    async def _run(self, job):
+        request_id.set(job.id)
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(max(1, self._workers))
+        async with self._slots:
+            try:
+                await self._synthesize(job)
+            except Exception as e:
+                job.status, job.error = FAILED, str(e)
+                self._save(job)
+
+    async def _synthesize(self, job):
+        job.status, job.failed = RUNNING, []
+        self._save(job)
+        done = set(i for i in job.done if os.path.exists(self._chunk_path(job, i)))
+        job.done = sorted(done)
+        todo = [i for i in range(len(job.chunks)) if i not in done]
+
+        synthesize = functools.partial(generate_audio, output_format=job.output_format)
+        async for n, audio in synthesize_chunks([job.chunks[i] for i in todo], job.voice_id, synthesize):
+            index = todo[n]
+            if not audio:
+                job.failed.append(index)
+                continue
+            with open(self._chunk_path(job, index), "wb") as f:
+                f.write(audio)
+            job.done.append(index)
+            self._save(job)
+
+        if job.failed:
+            job.status = FAILED
+            job.error = f"chunk(s) {', '.join(str(i + 1) for i in sorted(job.failed))} failed; resume the job to retry them"
+            self._save(job)
+            return
+
+        parts = []
+        for i in range(len(job.chunks)):
+            with open(self._chunk_path(job, i), "rb") as f:
+                parts.append(f.read())
+        job.result_path, info = await merge_chunks_async(
+            parts, prefix=f"job_{job.id}", target=self.results, audio_format=get_format(job.output_format))
+        job.duration, job.status = info.duration, DONE
+        self._save(job)
+
+    def resume(self, job_id):
+        """Restart a failed job; checkpointed chunks are kept."""
+        job = self.get(job_id)
+        if job is None or job.status != FAILED:
+            return job
+        job.status, job.error = QUEUED, None
+        self._save(job)
+        service_loop.submit(self._run(job))
+        return job
+
+    async def _sweep_forever(self, interval=600):
+        while True:
+            now = time.time()
+            for job in list(self._jobs.values()):
+                if job.finished and now - job.updated > self.ttl:
+                    del self._jobs[job.id]
+                    shutil.rmtree(self._job_dir(job.id), ignore_errors=True)
+            await asyncio.sleep(interval)
+
+
+def _link_or_copy(source, target):
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+job_manager = JobManager(JOBS_DIR)
+
+
+def _jobs_by_status():
+    counts = {(status,): 0 for status in (QUEUED, RUNNING, DONE, FAILED)}
+    for job in list(job_manager._jobs.values()):
+        counts[(job.status,)] += 1
+    return counts
+
+
+Gauge("tts_background_jobs", "Background jobs by status.", ["status"], fn=_jobs_by_status)
@@ -0,0 +1,198 @@
+"""
+ChatterboxTTS as an in-process synthesis backend.
+
+Local voices are stored `Conditionals` in TTS_LOCAL_VOICE_DIR, one
+`<name>.pt` per voice, plus the model's built-in "default" voice. They are
+offered under English US as "chatterbox-<name>" and always synthesized
+locally, next to the edge-tts voices. Store a voice from a reference
+recording with:
+
+    python -m voicegen.local save narrator reference.wav --exaggeration 0.6
+"""
+import argparse
+import asyncio
+import importlib.util
+import io
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .backends import SynthesisBackend, assign_voice, backend_named, register_backend
+from .formats import get_format
+from .text import split_text
+from .voices import Voice, voice_catalog
+
+
+# "auto" offers local voices when chatterbox and torch are installed and loads
+# the model on the first local chunk; "on" also loads it at startup; "off" never.
+LOCAL_TTS = os.environ.get("TTS_LOCAL", "auto")
+LOCAL_DEVICE = os.environ.get("TTS_LOCAL_DEVICE", "cpu")
+# Checkpoint directory; unset downloads the model from the Hugging Face hub once.
+LOCAL_MODEL_DIR = os.environ.get("TTS_LOCAL_MODEL_DIR")
+LOCAL_VOICE_DIR = os.environ.get(
+    "TTS_LOCAL_VOICE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "local_voices"))
+# Longest text per model call: ChatterboxTTS stops at 1000 speech tokens
+# (about 40 s), so longer chunks are split and their audio joined.
+LOCAL_MAX_CHARS = int(os.environ.get("TTS_LOCAL_MAX_CHARS", 300))
+DEFAULT_VOICE = "default"
+OPUS_BITRATE = "24k"
+
+
+def encode(samples, sample_rate, output_format):
+    """Float samples in [-1, 1] as audio bytes in an edge-tts output format."""
+    from pydub import AudioSegment
+
+    audio_format = get_format(output_format)
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+    segment = AudioSegment(pcm, frame_rate=sample_rate, sample_width=2, channels=1)
+    if segment.frame_rate != audio_format.sample_rate:
+        segment = segment.set_frame_rate(audio_format.sample_rate)
+    if audio_format.container == "pcm":
+        return segment.raw_data
+    out = io.BytesIO()
+    if audio_format.container == "mp3":
+        kbps = re.search(r"(\d+)kbitrate", audio_format.edge_format).group(1)
+        segment.export(out, format="mp3", bitrate=f"{kbps}k")
+    else:
+        segment.export(out, format=audio_format.container, codec="libopus", bitrate=OPUS_BITRATE)
+    return out.getvalue()
+
+
+class ChatterboxBackend(SynthesisBackend):
+    """
+    One ChatterboxTTS model, loaded on first use and owned by a single worker
+    thread, so chunks are synthesized one at a time and never block the
+    service loop. Each voice's `Conditionals` are loaded once and swapped
+    onto the model per chunk.
+    """
+
+    name = "chatterbox"
+    remote = False
+
+    def __init__(self, voice_dir=LOCAL_VOICE_DIR, device=LOCAL_DEVICE, model_dir=LOCAL_MODEL_DIR,
+                 exaggeration=0.5, cfg_weight=0.5, max_chars=LOCAL_MAX_CHARS, preload=LOCAL_TTS == "on"):
+        self.voice_dir = voice_dir
+        self.device = device
+        self.model_dir = model_dir
+        self.exaggeration = exaggeration
+        self.cfg_weight = cfg_weight
+        self.max_chars = max_chars
+        self.preload = preload
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chatterbox")
+        self._model = None
+        self._conds = {}
+
+    def voice_id(self, name):
+        return f"{self.name}-{name}"
+
+    def voice_names(self):
+        """The built-in voice and every stored one."""
+        names = [DEFAULT_VOICE]
+        if os.path.isdir(self.voice_dir):
+            names += sorted(n[:-len(".pt")] for n in os.listdir(self.voice_dir) if n.endswith(".pt"))
+        return list(dict.fromkeys(names))
+
+    # The methods below run on the worker thread only.
+
+    def _load(self):
+        if self._model is None:
+            from chatterbox.tts import ChatterboxTTS
+
+            if self.model_dir:
+                model = ChatterboxTTS.from_local(self.model_dir, self.device)
+            else:
+                model = ChatterboxTTS.from_pretrained(self.device)
+            if model.conds is not None:
+                self._conds[DEFAULT_VOICE] = model.conds
+            self._model = model
+        return self._model
+
+    def _conditionals(self, name):
+        if name not in self._conds:
+            from chatterbox.tts import Conditionals
+
+            path = os.path.join(self.voice_dir, name + ".pt")
+            if not os.path.exists(path):
+                raise ValueError(f"Unknown local voice: {name}")
+            self._conds[name] = Conditionals.load(path).to(self.device)
+        return self._conds[name]
+
+    def _generate(self, text, name, output_format):
+        model = self._load()
+        model.conds = self._conditionals(name)
+        # Pipeline chunks grow to thousands of characters; the model takes a few hundred.
+        pieces = split_text(text, max_chars=self.max_chars, first_chars=self.max_chars)
+        wavs = [model.generate(piece, exaggeration=self.exaggeration, cfg_weight=self.cfg_weight) for piece in pieces]
+        return encode(np.concatenate([wav.squeeze(0).numpy() for wav in wavs]), model.sr, output_format)
+
+    def _save_voice(self, name, wav_path, exaggeration):
+        model = self._load()
+        model.prepare_conditionals(wav_path, exaggeration=exaggeration)
+        os.makedirs(self.voice_dir, exist_ok=True)
+        model.conds.save(os.path.join(self.voice_dir, name + ".pt"))
+        self._conds[name] = model.conds
+
+    async def synthesize(self, text, voice_id, output_format):
+        prefix = self.name + "-"
+        if not voice_id.startswith(prefix):
+            raise ValueError(f"Not a local voice: {voice_id}")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._generate, text, voice_id[len(prefix):], output_format)
+
+    async def warm(self):
+        # The model is several GB; only load it up front when asked to (TTS_LOCAL=on).
+        if self.preload:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._load)
+
+    def save_voice(self, name, wav_path, exaggeration=0.5):
+        """Store a voice cloned from a reference recording as `<name>.pt`; returns its voice id."""
+        self._executor.submit(self._save_voice, name, wav_path, exaggeration).result()
+        return self.voice_id(name)
+
+
+register_backend(ChatterboxBackend.name, ChatterboxBackend)
+
+
+def local_tts_available():
+    return all(importlib.util.find_spec(module) for module in ("torch", "chatterbox"))
+
+
+def register_local_voices(catalog=voice_catalog, mode=LOCAL_TTS):
+    """
+    Route every local voice to the chatterbox backend and add it to the
+    catalog. Cheap: nothing is loaded until the first local chunk, or
+    `warm_up` with TTS_LOCAL=on.
+    Returns the voices added.
+    """
+    if mode == "off" or not local_tts_available():
+        return []
+    backend = backend_named(ChatterboxBackend.name)
+    voices = [Voice(backend.voice_id(name), "", "en-US", backend.name) for name in backend.voice_names()]
+    for voice in voices:
+        assign_voice(voice.voice_id, backend.name)
+    catalog.add_voices(voices)
+    return voices
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the voices of the local ChatterboxTTS backend.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    save = commands.add_parser("save", help="store a voice cloned from a reference recording")
+    save.add_argument("name", help="voice name; the voice id becomes chatterbox-<name>")
+    save.add_argument("wav", help="reference recording, a few seconds of clean speech")
+    save.add_argument("--exaggeration", type=float, default=0.5)
+    commands.add_parser("list", help="show the stored voices")
+    args = parser.parse_args()
+
+    backend = backend_named(ChatterboxBackend.name)
+    if args.command == "save":
+        print(f"✅ Saved {backend.save_voice(args.name, args.wav, args.exaggeration)} in {backend.voice_dir}")
+    else:
+        for name in backend.voice_names():
+            print(backend.voice_id(name))
+
+
+if __name__ == "__main__":
+    main()
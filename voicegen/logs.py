@@ -0,0 +1,52 @@
+import contextvars
+import json
+import logging
+import os
+import sys
+import uuid
+
+
+LOG_LEVEL = os.environ.get("TTS_LOG_LEVEL", "INFO")
+
+# Set once per user request and inherited by every task and service-loop
+# call it starts, so all log lines of one request share it.
+request_id = contextvars.ContextVar("request_id", default=None)
+
+logger = logging.getLogger("voicegen")
+
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+def new_request_id():
+    """Start a new request in the current context and return its id."""
+    rid = uuid.uuid4().hex[:12]
+    request_id.set(rid)
+    return rid
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, event, request id and any `extra` fields."""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "event": record.getMessage(),
+            "request_id": getattr(record, "request_id", None) or request_id.get(),
+        }
+        entry.update((k, v) for k, v in vars(record).items() if k not in _RECORD_FIELDS and k != "request_id")
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level=LOG_LEVEL):
+    """Send voicegen logs to stdout as JSON lines. Safe to call more than once."""
+    if any(isinstance(h.formatter, JsonFormatter) for h in logger.handlers):
+        return
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter())
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    logger.propagate = False
+
@@ -0,0 +1,45 @@
+import asyncio
+import contextvars
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .formats import DEFAULT_FORMAT
+from .logs import logger
+from .metrics import Histogram
+from .spool import spool
+
+
+# Merges run off the event loop on a small, bounded pool so one long script
+# can't stall chunk dispatch and progress updates for other users.
+MERGE_WORKERS = int(os.environ.get("TTS_MERGE_WORKERS", 2))
+
+_merge_pool = ThreadPoolExecutor(max_workers=MERGE_WORKERS, thread_name_prefix="voicegen-merge")
+
+merge_seconds = Histogram("tts_merge_seconds", "Time to join chunks into one file.", ["format"])
+
+
+def merge_chunks(parts, prefix="voice_output", target=None, audio_format=DEFAULT_FORMAT):
+    """Join chunk audio into a new file in `target` (default: the shared spool). Returns `(path, info)`."""
+    start = time.monotonic()
+    with (target or spool).create(prefix, audio_format.suffix) as (path, out):
+        info = audio_format.concat(parts, out)
+        size = out.tell()
+    seconds = time.monotonic() - start
+    merge_seconds.observe(seconds, format=audio_format.container)
+    logger.info("merge_done", extra={"parts": len(parts), "bytes": size, "seconds": round(seconds, 3)})
+    return path, info
+
+
+async def run_in_merge_pool(fn, *args):
+    """Run blocking audio work on the merge pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    # Executors don't carry context variables over; the request id should.
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_merge_pool, functools.partial(context.run, fn, *args))
+
+
+async def merge_chunks_async(parts, prefix="voice_output", target=None, audio_format=DEFAULT_FORMAT):
+    """`merge_chunks` on the merge pool."""
+    return await run_in_merge_pool(merge_chunks, list(parts), prefix, target, audio_format)
@@ -0,0 +1,138 @@
+"""
+Byte-level MP3 handling: walk frame headers, drop ID3 tags and Xing/Info/VBRI
+header frames, and join streams without decoding or re-encoding.
+"""
+from dataclasses import dataclass
+
+
+# Bitrates in kbit/s indexed by [version is MPEG1][layer][bitrate index].
+_BITRATES = {
+    True: {
+        1: (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+        2: (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+        3: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    },
+    False: {
+        1: (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+        2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+        3: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    },
+}
+# Sample rates indexed by version bits (0: MPEG2.5, 2: MPEG2, 3: MPEG1).
+_SAMPLE_RATES = {
+    0: (11025, 12000, 8000),
+    2: (22050, 24000, 16000),
+    3: (44100, 48000, 32000),
+}
+
+
+@dataclass
+class Mp3Info:
+    frames: int = 0
+    # Total duration in seconds, summed per frame so mixed sample rates stay exact.
+    duration: float = 0.0
+
+
+def _parse_header(data, pos):
+    """Return (frame_length, samples, sample_rate, side_info_len) for a frame header at `pos`, or None."""
+    if pos + 4 > len(data) or data[pos] != 0xFF or (data[pos + 1] & 0xE0) != 0xE0:
+        return None
+    version = (data[pos + 1] >> 3) & 0x03
+    layer = 4 - ((data[pos + 1] >> 1) & 0x03)
+    bitrate_index = data[pos + 2] >> 4
+    rate_index = (data[pos + 2] >> 2) & 0x03
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    mpeg1 = version == 3
+    bitrate = _BITRATES[mpeg1][layer][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    padding = (data[pos + 2] >> 1) & 0x01
+    if layer == 1:
+        length, samples = (12 * bitrate // sample_rate + padding) * 4, 384
+    elif layer == 2:
+        length, samples = 144 * bitrate // sample_rate + padding, 1152
+    else:
+        samples = 1152 if mpeg1 else 576
+        length = (144 if mpeg1 else 72) * bitrate // sample_rate + padding
+    mono = (data[pos + 3] >> 6) == 3
+    side_info = (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+    return length, samples, sample_rate, side_info
+
+
+def _audio_bounds(data):
+    """Byte range of `data` left after removing a leading ID3v2 tag and a trailing ID3v1 tag."""
+    start, end = 0, len(data)
+    if data[:3] == b"ID3" and end >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        footer = 10 if data[5] & 0x10 else 0
+        start = 10 + size + footer
+    if end - start >= 128 and data[end - 128:end - 125] == b"TAG":
+        end -= 128
+    return start, end
+
+
+def _is_vbr_header(data, pos, side_info):
+    """True if the frame at `pos` is a Xing/Info/VBRI header frame rather than audio."""
+    tag = bytes(data[pos + 4 + side_info:pos + 8 + side_info])
+    return tag in (b"Xing", b"Info") or bytes(data[pos + 36:pos + 40]) == b"VBRI"
+
+
+def frame_spans(data, info=None):
+    """
+    Yield `(start, end)` byte spans of consecutive audio frames in `data`,
+    skipping tags, VBR header frames and any junk between frames. Adjacent
+    frames are merged into one span so callers can copy large slices.
+    If `info` is given, frame count and duration are added to it.
+    """
+    pos, end = _audio_bounds(data)
+    span_start = None
+    first = True
+    while pos < end:
+        header = _parse_header(data, pos)
+        if header is None or pos + header[0] > end:
+            if span_start is not None:
+                yield span_start, pos
+                span_start = None
+            pos = data.find(b"\xff", pos + 1, end)
+            if pos < 0:
+                return
+            continue
+        length, samples, sample_rate, side_info = header
+        if first and _is_vbr_header(data, pos, side_info):
+            pos += length
+            first = False
+            continue
+        first = False
+        if span_start is None:
+            span_start = pos
+        if info is not None:
+            info.frames += 1
+            info.duration += samples / sample_rate
+        pos += length
+    if span_start is not None:
+        yield span_start, pos
+
+
+def concat_mp3(parts, out):
+    """
+    Write the audio frames of every MP3 in `parts` (bytes-like objects) to the
+    binary file `out`, in order. Nothing is decoded or re-encoded and the cost
+    is linear in the input size. Returns an `Mp3Info` for the joined stream.
+    """
+    info = Mp3Info()
+    for data in parts:
+        view = memoryview(data)
+        for start, end in frame_spans(data, info):
+            out.write(view[start:end])
+    return info
+
+
+class Mp3Joiner:
+    """Incremental `concat_mp3`: `add` returns the audio frames of the next chunk."""
+
+    def __init__(self):
+        self.info = Mp3Info()
+
+    def add(self, data, last=False):
+        view = memoryview(data)
+        return b"".join(view[start:end] for start, end in frame_spans(data, self.info))
@@ -0,0 +1,87 @@
+import asyncio
+import contextvars
+import os
+import time
+import uuid
+
+from .logs import logger, request_id
+from .metrics import Counter, Gauge
+
+
+# Number of chunks sent to the TTS service at the same time.
+# 1 reproduces the old one-chunk-at-a-time behaviour.
+DEFAULT_CONCURRENCY = int(os.environ.get("TTS_CONCURRENCY", 4))
+
+# (job id, total characters) of the script a chunk belongs to, so the
+# scheduler can share upstream capacity fairly between jobs.
+current_job = contextvars.ContextVar("current_job", default=None)
+
+jobs_in_flight = Gauge("tts_jobs_in_flight", "Scripts being synthesized (interactive, background and batch).")
+chunks_total = Counter("tts_chunks_total", "Chunks finished, failed ones included, after de-duplication within a script.")
+
+
+async def synthesize_chunks(chunks, voice_id, synthesize, concurrency=DEFAULT_CONCURRENCY):
+    """
+    Run `synthesize(chunk, voice_id)` for every chunk with at most `concurrency`
+    calls in flight, yielding `(index, result)` as each one finishes.
+    `voice_id` is one voice for every chunk, or a list giving each chunk's
+    voice (dialogue scripts).
+
+    Results arrive in completion order; callers put them back in input order
+    using the index. Chunks that repeat within the script in the same voice
+    are synthesized once and reported for every position they occur at.
+    Closing the generator cancels whatever is still running.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    voices = [voice_id] * len(chunks) if isinstance(voice_id, str) else list(voice_id)
+
+    positions = {}
+    for i, chunk in enumerate(chunks):
+        positions.setdefault((" ".join(chunk.split()), voices[i]), []).append(i)
+
+    job = (uuid.uuid4().hex, sum(len(chunk) for chunk in chunks))
+
+    async def run(indexes):
+        current_job.set(job)  # each task has its own context copy
+        async with semaphore:
+            return indexes, await synthesize(chunks[indexes[0]], voices[indexes[0]])
+
+    tasks = [asyncio.ensure_future(run(indexes)) for indexes in positions.values()]
+    jobs_in_flight.inc()
+    started, failed, finished = time.monotonic(), 0, 0
+    rid = request_id.get()  # the generator may be closed from another context
+    logger.info("job_start", extra={"voice": voice_id if isinstance(voice_id, str) else sorted(set(voices)),
+                                    "chunks": len(chunks), "unique": len(tasks), "chars": job[1]})
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            indexes, result = await next_done
+            finished += 1
+            failed += not result
+            for i in indexes:
+                yield i, result
+    finally:
+        for task in tasks:
+            task.cancel()
+        jobs_in_flight.dec()
+        chunks_total.inc(finished)
+        logger.info("job_end", extra={"request_id": rid, "chunks": len(tasks), "finished": finished, "failed": failed,
+                                      "seconds": round(time.monotonic() - started, 3)})
+
+
+class InOrderBuffer:
+    """
+    Collects results that arrive out of order and releases them as soon as
+    they extend the contiguous prefix starting at index 0.
+    """
+
+    def __init__(self, total):
+        self.items = [None] * total
+        self.next_index = 0
+
+    def add(self, index, item):
+        self.items[index] = item
+        released = []
+        while self.next_index < len(self.items) and self.items[self.next_index] is not None:
+            released.append(self.items[self.next_index])
+            self.next_index += 1
+        return released
@@ -0,0 +1,89 @@
+import asyncio
+import os
+import tempfile
+
+from .pipeline import DEFAULT_CONCURRENCY
+from .service_loop import service_loop
+from .synthesis import generate_audio
+from .voices import voice_catalog
+
+
+PREVIEW_TEXT = "This is a voice sample."
+PREVIEW_DIR = os.environ.get("TTS_PREVIEW_DIR", os.path.join(tempfile.gettempdir(), "voicegen-previews"))
+# Which previews to render at startup: "map" (the voices the app passes in,
+# e.g. its default language), "all" (every voice in the catalog) or "off"
+# (render on first click only).
+PREVIEW_WARM = os.environ.get("TTS_PREVIEW_WARM", "map")
+
+
+class PreviewLibrary:
+    """
+    One pre-rendered sample per voice, persisted in `root` as `<voice_id>.mp3`.
+
+    The set of rendered voices is kept in memory, so serving a preview that
+    already exists is a dict lookup and a file read. Missing previews are
+    rendered on first request, or ahead of time with `warm`.
+    """
+
+    def __init__(self, root, synthesize, text=PREVIEW_TEXT):
+        self.root = root
+        self.synthesize = synthesize
+        self.text = text
+        os.makedirs(root, exist_ok=True)
+        self._paths = {
+            name[:-len(".mp3")]: os.path.join(root, name)
+            for name in os.listdir(root) if name.endswith(".mp3")
+        }
+
+    def __contains__(self, voice_id):
+        return voice_id in self._paths
+
+    async def get(self, voice_id):
+        """Path of the preview for `voice_id`, rendering it first if needed."""
+        if not voice_id:
+            return None
+        path = self._paths.get(voice_id)
+        if path:
+            return path
+        return await self._render(voice_id)
+
+    async def _render(self, voice_id):
+        audio = await self.synthesize(self.text, voice_id)
+        if not audio:
+            return None
+        path = os.path.join(self.root, voice_id + ".mp3")
+        partial = path + ".part"
+        with open(partial, "wb") as f:
+            f.write(audio)
+        os.replace(partial, path)
+        self._paths[voice_id] = path
+        return path
+
+    async def warm(self, voice_ids, concurrency=DEFAULT_CONCURRENCY):
+        """Render every missing preview in `voice_ids`, a few at a time."""
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def render(voice_id):
+            async with semaphore:
+                await self._render(voice_id)
+
+        missing = [v for v in dict.fromkeys(voice_ids) if v not in self._paths]
+        await asyncio.gather(*(render(v) for v in missing))
+        return len(missing)
+
+    def warm_in_background(self, voice_ids):
+        """Run `warm` on the service loop so startup is not delayed. Returns a future."""
+        return service_loop.submit(self.warm(voice_ids))
+
+
+def preview_voice_ids(voice_ids, mode=PREVIEW_WARM):
+    """Voices to pre-render for `mode` (see PREVIEW_WARM)."""
+    if mode == "off":
+        return []
+    voice_ids = list(voice_ids)
+    if mode == "all":
+        voice_ids += voice_catalog.voice_ids()
+    return voice_ids
+
+
+preview_library = PreviewLibrary(PREVIEW_DIR, generate_audio)
@@ -0,0 +1,97 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+
+
+RETRY_ATTEMPTS = int(os.environ.get("TTS_RETRIES", 3))
+RETRY_BASE_DELAY = float(os.environ.get("TTS_RETRY_BASE_DELAY", 0.5))
+RETRY_MAX_DELAY = 8.0
+# Send a duplicate request when a chunk is slower than this percentile of recent ones.
+HEDGE_ENABLED = os.environ.get("TTS_HEDGE", "0") == "1"
+HEDGE_PERCENTILE = 0.95
+HEDGE_MIN_SAMPLES = 20
+
+# Errors that retrying can't fix (bad voice name, bad parameters).
+NON_RETRYABLE = (ValueError, TypeError)
+
+
+class LatencyTracker:
+    """
+    Recent upstream latencies, normalized per character so short and long
+    chunks can share one distribution.
+    """
+
+    def __init__(self, window=200):
+        self._per_char = deque(maxlen=window)
+
+    def record(self, seconds, chars):
+        self._per_char.append(seconds / max(chars, 100))
+
+    def percentile(self, q, chars):
+        """Expected latency at quantile `q` for a chunk of `chars` characters, or None without enough data."""
+        if len(self._per_char) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._per_char)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * max(chars, 100)
+
+
+class Resilience:
+    """Retry with exponential backoff and jitter, plus optional hedged requests."""
+
+    def __init__(self, attempts=RETRY_ATTEMPTS, base_delay=RETRY_BASE_DELAY, hedge=HEDGE_ENABLED):
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.hedge = hedge
+        self.latency = LatencyTracker()
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def backoff(self, attempt):
+        """Delay before retry number `attempt` (0-based): exponential, capped, with full jitter."""
+        return random.uniform(0, min(RETRY_MAX_DELAY, self.base_delay * 2 ** attempt))
+
+    async def call(self, make_call, chars):
+        """
+        Await `make_call()` (a coroutine factory) until it succeeds or the
+        attempts run out; the last error is re-raised.
+        """
+        for attempt in range(self.attempts):
+            try:
+                return await self._hedged(make_call, chars)
+            except NON_RETRYABLE:
+                raise
+            except Exception:
+                if attempt == self.attempts - 1:
+                    raise
+                self.retries += 1
+                await asyncio.sleep(self.backoff(attempt))
+
+    async def _hedged(self, make_call, chars):
+        start = time.monotonic()
+        primary = asyncio.ensure_future(make_call())
+        tasks = [primary]
+        hedge_after = self.latency.percentile(HEDGE_PERCENTILE, chars) if self.hedge else None
+        try:
+            if hedge_after is not None:
+                done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+                if not done:
+                    self.hedges += 1
+                    tasks.append(asyncio.ensure_future(make_call()))
+            error = None
+            while tasks:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    tasks.remove(task)
+                    if task.exception() is None:
+                        self.latency.record(time.monotonic() - start, chars)
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
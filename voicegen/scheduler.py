@@ -0,0 +1,101 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+
+from .metrics import Gauge, Histogram
+
+
+# Upstream requests allowed in flight across all users.
+MAX_IN_FLIGHT = int(os.environ.get("TTS_MAX_IN_FLIGHT", 8))
+# Chunks allowed to wait for a slot before new interactive requests are turned away.
+MAX_QUEUED = int(os.environ.get("TTS_MAX_QUEUED", 200))
+# Jobs up to this many characters are served ahead of longer ones.
+SHORT_JOB_CHARS = int(os.environ.get("TTS_SHORT_JOB_CHARS", 1500))
+# Gradio workers; upstream load is bounded by the scheduler, not by this.
+UI_CONCURRENCY = int(os.environ.get("TTS_UI_CONCURRENCY", 16))
+
+
+class FairScheduler:
+    """
+    Global admission control for upstream requests.
+
+    At most `max_in_flight` requests run at once. Waiting requests are kept in
+    one FIFO per owner (a job) and slots are handed out round-robin across
+    owners, so a book-length script interleaves with everyone else instead of
+    queueing ahead of them. Owners whose job is at most `short_chars` long are
+    served first, which keeps typical latency low under load.
+
+    Must only be used from one event loop (the service loop).
+    """
+
+    def __init__(self, max_in_flight=MAX_IN_FLIGHT, max_queued=MAX_QUEUED, short_chars=SHORT_JOB_CHARS):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queued = max_queued
+        self.short_chars = short_chars
+        self.in_flight = 0
+        self.queued = 0
+        self._waiting = OrderedDict()  # owner -> deque of futures, in round-robin order
+        self._job_chars = {}
+
+    def busy_message(self, chunks):
+        """A back-pressure message if `chunks` more requests would overflow the queue, else None."""
+        if self.queued and self.queued + chunks > self.max_queued:
+            return f"🚦 Server is busy ({self.queued} chunks waiting). Please try again in a minute."
+        return None
+
+    async def run(self, owner, job_chars, make_call):
+        """Await `make_call()` once a slot is granted to `owner`."""
+        if self.in_flight < self.max_in_flight and not self.queued:
+            self.in_flight += 1
+        else:
+            granted = asyncio.get_running_loop().create_future()
+            self._waiting.setdefault(owner, deque()).append(granted)
+            self._job_chars[owner] = job_chars
+            self.queued += 1
+            queued_at = time.monotonic()
+            try:
+                await granted
+                queue_wait.observe(time.monotonic() - queued_at)
+            except asyncio.CancelledError:
+                if granted.done() and not granted.cancelled():
+                    self._finish()
+                raise
+        try:
+            return await make_call()
+        finally:
+            self._finish()
+
+    def _finish(self):
+        self.in_flight -= 1
+        self._dispatch()
+
+    def _next_owner(self):
+        for owner in self._waiting:
+            if self._job_chars.get(owner, 0) <= self.short_chars:
+                return owner
+        return next(iter(self._waiting))
+
+    def _dispatch(self):
+        while self.in_flight < self.max_in_flight and self._waiting:
+            owner = self._next_owner()
+            waiting = self._waiting[owner]
+            granted = waiting.popleft()
+            self.queued -= 1
+            if waiting:
+                self._waiting.move_to_end(owner)
+            else:
+                del self._waiting[owner]
+                del self._job_chars[owner]
+            if granted.cancelled():
+                continue
+            self.in_flight += 1
+            granted.set_result(None)
+
+
+queue_wait = Histogram("tts_queue_wait_seconds", "Time chunks waited for an upstream slot.")
+
+scheduler = FairScheduler()
+
+Gauge("tts_chunks_queued", "Chunks waiting for an upstream slot.", fn=lambda: scheduler.queued)
+Gauge("tts_upstream_in_flight", "Upstream requests running.", fn=lambda: scheduler.in_flight)
@@ -0,0 +1,43 @@
+import asyncio
+import threading
+
+
+class ServiceLoop:
+    """
+    A long-lived event loop on a daemon thread.
+
+    All upstream I/O runs here, so connections and other loop-bound state
+    outlive individual Gradio requests instead of being torn down with a
+    per-call `asyncio.run`.
+    """
+
+    def __init__(self, name="voicegen-service-loop"):
+        self.name = name
+        self._loop = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name=self.name, daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def submit(self, coro):
+        """Schedule `coro` on the service loop and return a `concurrent.futures.Future`."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """Run `coro` on the service loop and block until it finishes. For sync callers."""
+        return self.submit(coro).result(timeout)
+
+    async def run_async(self, coro):
+        """Await `coro` on the service loop from any other event loop."""
+        if asyncio.get_running_loop() is self._loop:
+            return await coro
+        return await asyncio.wrap_future(self.submit(coro))
+
+
+service_loop = ServiceLoop()
@@ -0,0 +1,81 @@
+"""
+Silent audio in any edge-tts output format, built byte by byte: gaps between
+dialogue lines, and the fake edge-tts server's answers.
+
+MP3 silence is frames with empty side info, Opus silence is the standard
+20 ms silence frame, so both join with real chunks at the container level.
+"""
+import re
+import struct
+
+from .containers import _element, _ogg_crc
+from .mp3 import _BITRATES, _SAMPLE_RATES
+
+
+OPUS_SILENCE = b"\xf8\xff\xfe"  # one 20 ms Opus frame of silence
+
+
+def _mp3_silence(seconds, sample_rate, kbps):
+    mpeg1 = sample_rate >= 32000
+    version = 3 if mpeg1 else 2
+    header = bytes((
+        0xFF,
+        0xE0 | version << 3 | 0x02 | 0x01,  # layer III, no CRC
+        _BITRATES[mpeg1][3].index(kbps) << 4 | _SAMPLE_RATES[version].index(sample_rate) << 2,
+        0xC4,  # mono
+    ))
+    length = (144 if mpeg1 else 72) * kbps * 1000 // sample_rate
+    samples = 1152 if mpeg1 else 576
+    return (header + bytes(length - 4)) * max(1, round(seconds * sample_rate / samples))
+
+
+def _ogg_page(flags, granule, sequence, packets):
+    lacing = b"".join(b"\xff" * (len(p) // 255) + bytes([len(p) % 255]) for p in packets)
+    page = bytearray(b"OggS\x00" + bytes([flags]) + struct.pack("<qIII", granule, 1, sequence, 0)
+                     + bytes([len(lacing)]) + lacing + b"".join(packets))
+    struct.pack_into("<I", page, 22, _ogg_crc(page))
+    return bytes(page)
+
+
+def _opus_head(sample_rate):
+    return b"OpusHead" + struct.pack("<BBHIhB", 1, 1, 312, sample_rate, 0, 0)
+
+
+def _ogg_silence(seconds, sample_rate):
+    frames = max(1, round(seconds * 50))
+    pages = [_ogg_page(0x02, 0, 0, [_opus_head(sample_rate)]), _ogg_page(0, 0, 1, [b"OpusTags" + bytes(8)])]
+    for start in range(0, frames, 50):
+        count = min(50, frames - start)
+        flags = 0x04 if start + count == frames else 0
+        pages.append(_ogg_page(flags, 312 + (start + count) * 960, len(pages), [OPUS_SILENCE] * count))
+    return b"".join(pages)
+
+
+def _webm_silence(seconds, sample_rate):
+    frames = max(1, round(seconds * 50))
+    ebml = _element(0x1A45DFA3, _element(0x4282, b"webm"))
+    info = _element(0x1549A966, _element(0x2AD7B1, (1_000_000).to_bytes(3, "big")))
+    track = _element(0xAE, _element(0xD7, b"\x01") + _element(0x83, b"\x02")
+                     + _element(0x86, b"A_OPUS") + _element(0x63A2, _opus_head(sample_rate)))
+    clusters = b""
+    for start in range(0, frames, 50):
+        blocks = b"".join(
+            _element(0xA3, b"\x81" + struct.pack(">h", i * 20) + b"\x80" + OPUS_SILENCE)
+            for i in range(min(50, frames - start))
+        )
+        clusters += _element(0x1F43B675, _element(0xE7, (start * 20).to_bytes(4, "big")) + blocks)
+    return ebml + b"\x18\x53\x80\x67\x01\xff\xff\xff\xff\xff\xff\xff" + info + _element(0x1654AE6B, track) + clusters
+
+
+def silence(seconds, output_format):
+    """About `seconds` of silence in `output_format` (an edge-tts format name)."""
+    sample_rate = int(re.search(r"(\d+)khz", output_format).group(1)) * 1000
+    if output_format.endswith("-mp3"):
+        return _mp3_silence(seconds, sample_rate, int(re.search(r"(\d+)kbitrate", output_format).group(1)))
+    if output_format.startswith("ogg-"):
+        return _ogg_silence(seconds, sample_rate)
+    if output_format.startswith("webm-"):
+        return _webm_silence(seconds, sample_rate)
+    if output_format.startswith("raw-"):
+        return bytes(int(seconds * sample_rate) * 2)
+    raise ValueError(f"Unsupported output format: {output_format}")
@@ -0,0 +1,40 @@
+import asyncio
+
+
+class SingleFlight:
+    """
+    Shares one in-flight call between concurrent callers with the same key.
+
+    The first caller for a key starts `make_call()`; callers arriving before
+    it finishes await the same task and get the same result or exception.
+    A caller that gives up does not cancel the call for the others; it is
+    cancelled only once nobody is waiting for it. Use from one event loop.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._flights = {}  # key -> [task, number of waiting callers]
+
+    def __len__(self):
+        return len(self._flights)
+
+    async def do(self, key, make_call):
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = [asyncio.ensure_future(make_call()), 0]
+            flight[0].add_done_callback(lambda _: self._land(key, flight))
+            self.calls += 1
+        else:
+            self.shared += 1
+        flight[1] += 1
+        try:
+            return await asyncio.shield(flight[0])
+        finally:
+            flight[1] -= 1
+            if not flight[1] and not flight[0].done():
+                flight[0].cancel()
+
+    def _land(self, key, flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
@@ -0,0 +1,152 @@
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+from .logs import logger
+
+
+SPOOL_DIR = os.environ.get("TTS_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "voicegen-spool"))
+SPOOL_TTL = int(os.environ.get("TTS_SPOOL_TTL", 3600))  # seconds a finished file is kept
+SPOOL_MAX_BYTES = int(os.environ.get("TTS_SPOOL_MAX_MB", 1024)) * 1024 * 1024
+SPOOL_SWEEP_INTERVAL = int(os.environ.get("TTS_SPOOL_SWEEP_INTERVAL", 60))
+# Unfinished `.part` files older than this are treated as leftovers of a crash.
+PARTIAL_GRACE = 600
+# Gradio copies every file an output component shows into a hash-named
+# folder here and never removes it; same default as Gradio's own.
+GRADIO_TEMP_DIR = os.environ.get("GRADIO_TEMP_DIR") or os.path.join(tempfile.gettempdir(), "gradio")
+
+
+class Spool:
+    """
+    Managed directory for generated audio.
+
+    Every file gets a unique name, is written under a `.part` name and renamed
+    once complete. A sweep removes files older than `ttl`, then the oldest
+    files until the directory fits in `max_bytes`; files that are held (still
+    being written or served) are never removed. The directory is rescanned on
+    every sweep, so files left by a previous run are picked up on startup.
+
+    With `nested`, files in subfolders are swept too and folders left empty
+    for longer than `ttl` are removed (Gradio's temp dir).
+    """
+
+    def __init__(self, root, ttl, max_bytes, nested=False):
+        self.root = root
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.nested = nested
+        self._held = Counter()
+        self._lock = threading.Lock()
+        self._janitor = None
+        os.makedirs(root, exist_ok=True)
+
+    def new_path(self, prefix, suffix):
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        return os.path.join(self.root, f"{prefix}_{stamp}_{uuid.uuid4().hex[:8]}{suffix}")
+
+    @contextmanager
+    def hold(self, path):
+        """Protect `path` from eviction for the duration of the block."""
+        with self._lock:
+            self._held[path] += 1
+        try:
+            yield path
+        finally:
+            with self._lock:
+                self._held[path] -= 1
+                if self._held[path] <= 0:
+                    del self._held[path]
+
+    @contextmanager
+    def create(self, prefix="voice_output", suffix=".mp3"):
+        """
+        Open a new spool file for writing, yielding `(path, file)`. The file only
+        appears under `path` once the block completes without error.
+        """
+        path = self.new_path(prefix, suffix)
+        partial = path + ".part"
+        with self.hold(path):
+            try:
+                with open(partial, "wb") as f:
+                    yield path, f
+                os.replace(partial, path)
+            except BaseException:
+                if os.path.exists(partial):
+                    os.remove(partial)
+                raise
+
+    def sweep(self):
+        """Apply the TTL and size quota once. Returns the number of files removed."""
+        now = time.time()
+        with self._lock:
+            held = set(self._held)
+        files, removed, total = [], 0, 0
+        for entry in self._entries():
+            stat = entry.stat()
+            partial = entry.name.endswith(".part")
+            owner = entry.path[:-len(".part")] if partial else entry.path
+            expired = now - stat.st_mtime > (PARTIAL_GRACE if partial else self.ttl)
+            if expired and owner not in held:
+                removed += self._remove(entry.path)
+                continue
+            files.append((stat.st_mtime, entry.path, stat.st_size, partial or owner in held))
+            total += stat.st_size
+        for _, path, size, keep in sorted(files):
+            if total <= self.max_bytes:
+                break
+            if keep:
+                continue
+            removed += self._remove(path)
+            total -= size
+        if self.nested:
+            self._remove_empty_folders(now)
+        return removed
+
+    def _entries(self, root=None):
+        for entry in os.scandir(root or self.root):
+            if entry.is_file():
+                yield entry
+            elif self.nested and entry.is_dir(follow_symlinks=False):
+                yield from self._entries(entry.path)
+
+    def _remove_empty_folders(self, now):
+        for entry in os.scandir(self.root):
+            if entry.is_dir(follow_symlinks=False) and now - entry.stat().st_mtime > self.ttl:
+                try:
+                    os.rmdir(entry.path)
+                except OSError:
+                    pass  # not empty
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return 1
+        except FileNotFoundError:
+            return 0
+
+    def start_janitor(self, interval=SPOOL_SWEEP_INTERVAL):
+        """Sweep now, then every `interval` seconds on a daemon thread."""
+        if self._janitor is not None:
+            return self._janitor
+
+        def run():
+            while True:
+                try:
+                    self.sweep()
+                except OSError as e:
+                    logger.warning("spool_sweep_error", extra={"error": repr(e)})
+                time.sleep(interval)
+
+        self._janitor = threading.Thread(target=run, daemon=True)
+        self._janitor.start()
+        return self._janitor
+
+
+spool = Spool(SPOOL_DIR, SPOOL_TTL, SPOOL_MAX_BYTES)
+# Gradio's copies of merged files, job results and batch zips, under the same limits.
+gradio_files = Spool(GRADIO_TEMP_DIR, SPOOL_TTL, SPOOL_MAX_BYTES, nested=True)
@@ -0,0 +1,103 @@
+import os
+import tempfile
+import time
+
+from .backends import backend_for, backends_in_use, get_dispatcher
+from .cache import AudioCache, cache_key
+from .edge import OUTPUT_FORMAT
+from .logs import logger
+from .metrics import Counter, Gauge, Histogram
+from .pipeline import current_job
+from .resilience import Resilience
+from .scheduler import scheduler
+from .service_loop import service_loop
+from .singleflight import SingleFlight
+
+
+CACHE_DIR = os.environ.get("TTS_CACHE_DIR", os.path.join(tempfile.gettempdir(), "voicegen-cache"))
+CACHE_MAX_BYTES = int(os.environ.get("TTS_CACHE_MAX_MB", 512)) * 1024 * 1024
+
+audio_cache = AudioCache(CACHE_DIR, CACHE_MAX_BYTES)
+resilience = Resilience()
+in_flight = SingleFlight()  # chunk calls shared between concurrent requests, on the service loop
+
+upstream_latency = Histogram(
+    "tts_upstream_latency_seconds", "Backend time per chunk attempt, excluding queueing.", ["backend", "voice"])
+upstream_errors = Counter("tts_upstream_errors_total", "Failed backend attempts by error type.", ["backend", "error"])
+upstream_bytes = Counter("tts_upstream_bytes_total", "Audio bytes received from the backend.", ["backend"])
+chunk_failures = Counter("tts_chunk_failures_total", "Chunks that still failed after every retry.")
+Counter("tts_cache_lookups_total", "Chunk cache lookups.", ["result"],
+        fn=lambda: {("hit",): audio_cache.hits, ("miss",): audio_cache.misses})
+Gauge("tts_cache_hit_ratio", "Share of chunk cache lookups that were hits.", fn=lambda: audio_cache.stats()["hit_ratio"])
+Gauge("tts_cache_bytes", "Size of the chunk cache.", fn=lambda: audio_cache.stats()["bytes"])
+Counter("tts_retries_total", "Chunk attempts retried after an error.", fn=lambda: resilience.retries)
+Counter("tts_hedges_total", "Duplicate requests sent for slow chunks.", fn=lambda: resilience.hedges)
+Counter("tts_hedge_wins_total", "Hedged requests that finished first.", fn=lambda: resilience.hedge_wins)
+Counter("tts_coalesced_chunks_total", "Chunk requests that joined an identical call already in flight.",
+        fn=lambda: in_flight.shared)
+Gauge("tts_chunks_in_flight", "Distinct chunk calls in flight, retries and queueing included.", fn=lambda: len(in_flight))
+
+
+async def generate_audio(text, voice_id, output_format=OUTPUT_FORMAT):
+    """
+    Synthesize `text` with the backend serving `voice_id` (edge-tts unless
+    the voice is assigned elsewhere) and return the audio bytes in
+    `output_format` (an edge-tts format name), or None once every retry has
+    failed. The request runs on the service loop; nothing is written to disk
+    except the cache entry, which is also what lets a failed job resume.
+
+    Concurrent requests for the same chunk, voice and format share one
+    backend call and all receive its bytes.
+    """
+    backend = backend_for(voice_id)
+    cache_format = backend.cache_format(output_format)
+    cached = audio_cache.get(text, voice_id, cache_format)
+    if cached:
+        return cached
+    owner, job_chars = current_job.get() or (id(text), len(text))
+
+    async def call():
+        start = time.monotonic()
+        try:
+            audio = await backend.synthesize(text, voice_id, output_format)
+        except Exception as e:
+            upstream_errors.inc(backend=backend.name, error=type(e).__name__)
+            logger.warning("upstream_error", extra={"voice": voice_id, "chars": len(text), "error": repr(e)})
+            raise
+        seconds = time.monotonic() - start
+        upstream_latency.observe(seconds, backend=backend.name, voice=voice_id)
+        upstream_bytes.inc(len(audio), backend=backend.name)
+        logger.debug("upstream_done", extra={"voice": voice_id, "chars": len(text), "seconds": round(seconds, 3)})
+        return audio
+
+    # Each attempt (and each hedge) waits for its own scheduler slot, so
+    # backoff sleeps never hold upstream capacity.
+    def attempt():
+        return scheduler.run(owner, job_chars, call)
+
+    async def fetch():
+        try:
+            if backend.remote:
+                audio = await resilience.call(attempt, len(text))
+            else:
+                audio = await call()
+        except Exception as e:
+            chunk_failures.inc()
+            logger.error("chunk_failed", extra={"voice": voice_id, "chars": len(text), "error": repr(e)})
+            return None
+        audio_cache.put(text, voice_id, cache_format, audio)
+        return audio
+
+    key = cache_key(text, voice_id, cache_format)
+    return await service_loop.run_async(in_flight.do(key, fetch))
+
+
+def warm_up():
+    """
+    Warm every backend in use (open connections, load models) in the
+    background; returns immediately. With worker processes, remote backends
+    are warmed by the workers.
+    """
+    for backend in backends_in_use():
+        if not (backend.remote and get_dispatcher()):
+            service_loop.submit(backend.warm())
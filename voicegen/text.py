@@ -0,0 +1,155 @@
+import re
+
+
+# Hard ceiling per request to the TTS service.
+MAX_CHARS = 4500
+# The first chunk is kept short so the listener hears audio quickly; every
+# following chunk may be GROWTH times larger than the previous limit, up to
+# MAX_CHARS.
+FIRST_CHARS = 300
+GROWTH = 2.0
+
+# A sentence runs up to terminal punctuation (plus any closing quotes or
+# brackets) followed by whitespace or the end of the text, or up to a line
+# break; "example.com", "$4.99" and "2.0.1" stay inside their sentence. CJK
+# full stops need no space after them. The final alternative picks up
+# trailing text.
+_SENTENCE_RE = re.compile(
+    r"(?:[^.!?…。！？\n]|[.!?…]+(?![.!?…]|[\"'”’)\]]*(?:\s|$)))*"
+    r"(?:[.!?…]+[\"'”’)\]]*(?=\s|$)|[。！？]+[\"'”’)\]]*|\n+|$)"
+)
+# Paragraphs are separated by blank lines.
+_PARAGRAPH_RE = re.compile(r"\n[^\S\n]*\n\s*")
+# Clauses end at commas, semicolons, colons and dashes.
+_CLAUSE_RE = re.compile(r"[^,;:—–]*(?:[,;:—–]+|$)")
+
+
+def _wrap_words(text, limit):
+    """Greedy word wrap; words longer than `limit` are cut."""
+    line, size = [], 0
+    for word in text.split():
+        while len(word) > limit:
+            if line:
+                yield " ".join(line)
+                line, size = [], 0
+            yield word[:limit]
+            word = word[limit:]
+        if line and size + 1 + len(word) > limit:
+            yield " ".join(line)
+            line, size = [], 0
+        size += len(word) + (1 if line else 0)
+        line.append(word)
+    if line:
+        yield " ".join(line)
+
+
+def _fit(sentence, limit):
+    """Break a sentence into pieces no longer than `limit`, preferring clause boundaries."""
+    if len(sentence) <= limit:
+        yield sentence
+        return
+    for match in _CLAUSE_RE.finditer(sentence):
+        clause = match.group().strip()
+        if not clause:
+            continue
+        if len(clause) <= limit:
+            yield clause
+        else:
+            yield from _wrap_words(clause, limit)
+
+
+def _sentences(paragraph):
+    for match in _SENTENCE_RE.finditer(paragraph):
+        sentence = " ".join(match.group().split())
+        if sentence:
+            yield sentence
+
+
+def split_text(text, max_chars=MAX_CHARS, first_chars=FIRST_CHARS, growth=GROWTH):
+    """
+    Split `text` into chunks along sentence boundaries, falling back to clause
+    and then word boundaries for sentences that do not fit. A blank line
+    always ends a chunk, so a paragraph repeated in a script (or shared by
+    scripts, like a disclaimer) becomes the same chunk and is synthesized
+    once.
+
+    The first chunk is at most `first_chars` long and each later chunk's limit
+    grows geometrically by `growth` up to `max_chars`, so synthesis of the
+    opening finishes quickly while long scripts still use few requests.
+    Runs in linear time: pieces are collected in lists and joined once.
+    """
+    limit = max(1, min(first_chars, max_chars))
+    chunks = []
+
+    def close(current):
+        nonlocal limit
+        chunks.append(" ".join(current))
+        limit = min(max_chars, max(limit + 1, int(limit * growth)))
+
+    for paragraph in _PARAGRAPH_RE.split(text):
+        current, size = [], 0
+        for sentence in _sentences(paragraph):
+            for piece in _fit(sentence, limit):
+                if current and size + 1 + len(piece) > limit:
+                    close(current)
+                    current, size = [], 0
+                size += len(piece) + (1 if current else 0)
+                current.append(piece)
+        if current:
+            close(current)
+    return chunks
+
+
+def _units(text, max_chars):
+    """`(paragraph number, unit)`: the whitespace-normalized sentences of `text`, cut to fit `max_chars`."""
+    for number, paragraph in enumerate(_PARAGRAPH_RE.split(text)):
+        for sentence in _sentences(paragraph):
+            for unit in _fit(sentence, max_chars):
+                yield number, unit
+
+
+def rechunk(previous, text, max_chars=MAX_CHARS, first_chars=FIRST_CHARS, growth=GROWTH):
+    """
+    Split `text`, an edited version of a script that was split into the
+    `previous` chunks, keeping the old boundaries wherever the text did not
+    change: every previous chunk that still occurs, on sentence boundaries
+    and in order, is kept as is. Only the text in between is split again,
+    so an edit in one paragraph never shifts the chunks after it, and the
+    unchanged chunks hit the audio cache.
+
+    Returns `(chunks, reused)`, `reused` being the indexes of kept chunks.
+    """
+    # Units joined by spaces, and paragraphs by a blank line that split_text
+    # keeps as a chunk boundary.
+    pieces, starts, ends, offset, last = [], set(), set(), 0, None
+    for number, unit in _units(text, max_chars):
+        if pieces:
+            pieces.append(" " if number == last else "\n\n")
+            offset += len(pieces[-1])
+        starts.add(offset)
+        pieces.append(unit)
+        offset += len(unit)
+        ends.add(offset)
+        last = number
+    joined = "".join(pieces)
+
+    chunks, reused, cursor = [], [], 0
+
+    def split_between(start, end):
+        region = joined[start:end].strip()
+        if region:
+            # Only a region at the very start keeps the short first chunk
+            chunks.extend(split_text(region, max_chars, first_chars if not chunks else max_chars, growth))
+
+    for chunk in previous:
+        position = joined.find(chunk, cursor)
+        while position != -1 and (position not in starts or position + len(chunk) not in ends):
+            position = joined.find(chunk, position + 1)
+        if position == -1:
+            continue
+        split_between(cursor, position)
+        reused.append(len(chunks))
+        chunks.append(chunk)
+        cursor = position + len(chunk)
+    split_between(cursor, len(joined))
+    return chunks, reused
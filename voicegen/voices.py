@@ -0,0 +1,225 @@
+import asyncio
+import json
+import os
+import re
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+
+import edge_tts
+
+from .logs import logger
+from .service_loop import service_loop
+
+
+VOICES_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "voices.txt")
+# Last catalog fetched from the service; preferred over voices.txt at startup.
+CATALOG_FILE = os.environ.get("TTS_VOICE_CATALOG", os.path.join(tempfile.gettempdir(), "voicegen-voices.json"))
+# Seconds before the catalog is fetched again in the background; 0 turns refreshing off.
+CATALOG_TTL = int(os.environ.get("TTS_VOICE_CATALOG_TTL", 24 * 3600))
+RETRY_INTERVAL = 600
+
+LANGUAGE_NAMES = {
+    "af": "Afrikaans", "am": "Amharic", "ar": "Arabic", "az": "Azerbaijani", "bg": "Bulgarian",
+    "bn": "Bengali", "bs": "Bosnian", "ca": "Catalan", "cs": "Czech", "cy": "Welsh", "da": "Danish",
+    "de": "German", "el": "Greek", "en": "English", "es": "Spanish", "et": "Estonian", "fa": "Persian",
+    "fi": "Finnish", "fil": "Filipino", "fr": "French", "ga": "Irish", "gl": "Galician", "gu": "Gujarati",
+    "he": "Hebrew", "hi": "Hindi", "hr": "Croatian", "hu": "Hungarian", "id": "Indonesian",
+    "is": "Icelandic", "it": "Italian", "iu": "Inuktitut", "ja": "Japanese", "jv": "Javanese",
+    "ka": "Georgian", "kk": "Kazakh", "km": "Khmer", "kn": "Kannada", "ko": "Korean", "lo": "Lao",
+    "lt": "Lithuanian", "lv": "Latvian", "mk": "Macedonian", "ml": "Malayalam", "mn": "Mongolian",
+    "mr": "Marathi", "ms": "Malay", "mt": "Maltese", "my": "Burmese", "nb": "Norwegian", "ne": "Nepali",
+    "nl": "Dutch", "pl": "Polish", "ps": "Pashto", "pt": "Portuguese", "ro": "Romanian", "ru": "Russian",
+    "si": "Sinhala", "sk": "Slovak", "sl": "Slovenian", "so": "Somali", "sq": "Albanian", "sr": "Serbian",
+    "su": "Sundanese", "sv": "Swedish", "sw": "Swahili", "ta": "Tamil", "te": "Telugu", "th": "Thai",
+    "tr": "Turkish", "uk": "Ukrainian", "ur": "Urdu", "uz": "Uzbek", "vi": "Vietnamese", "zh": "Chinese",
+    "zu": "Zulu",
+}
+REGION_NAMES = {"GB": "UK"}
+# Language names the apps used before the catalog, still accepted in lookups.
+LANGUAGE_ALIASES = {
+    "Urdu": ("ur-PK",),
+    "Spanish": ("es-ES",),
+    "French": ("fr-FR",),
+    "German": ("de-DE",),
+    "Portuguese": ("pt-BR", "pt-PT"),
+}
+GENDER_ICONS = {"Male": "🧔", "Female": "👩"}
+
+
+@dataclass(frozen=True)
+class Voice:
+    voice_id: str
+    gender: str
+    locale: str
+    backend: str = "edge"  # other backends' voice ids are "<backend>-<name>"
+
+    @property
+    def name(self):
+        if self.backend != "edge":
+            return self.voice_id[len(self.backend) + 1:].replace("_", " ").title() + " (local)"
+        name = re.sub(r"Neural$", "", self.voice_id[len(self.locale) + 1:])
+        return re.sub(r"Multilingual$", " Multi", name)
+
+    @property
+    def label(self):
+        return f"{GENDER_ICONS.get(self.gender, '🗣️')} {self.name}"
+
+    @property
+    def language(self):
+        """Display name of the locale, e.g. "English US" or "Chinese CN Liaoning"."""
+        code, *rest = self.locale.split("-")
+        parts = [REGION_NAMES.get(part, part if part.isupper() else part.title()) for part in rest]
+        return " ".join([LANGUAGE_NAMES.get(code, code)] + parts)
+
+
+class _Index:
+    """Every lookup the catalog offers, precomputed. Never modified once built."""
+
+    def __init__(self, voices):
+        self.voices = list(voices)
+        self.by_id = {v.voice_id: v for v in self.voices}
+        self.by_language, self.by_locale, self.by_gender = {}, {}, {}
+        for v in self.voices:
+            self.by_language.setdefault(v.language, []).append(v)
+            self.by_locale.setdefault(v.locale, []).append(v)
+            self.by_gender.setdefault(v.gender, []).append(v)
+        self.languages = sorted(self.by_language)
+        for alias, locales in LANGUAGE_ALIASES.items():
+            self.by_language.setdefault(alias, [v for locale in locales for v in self.by_locale.get(locale, [])])
+        self.by_label = {}
+        for language, voices in self.by_language.items():
+            for v in voices:
+                self.by_label.setdefault((language, v.label), v)
+                self.by_label.setdefault((None, v.label), v)
+
+
+class VoiceCatalog:
+    """
+    All edge-tts voices with constant-time lookups by id, language, locale,
+    gender and UI label.
+
+    Startup never touches the network: the catalog comes from the last saved
+    snapshot or, failing that, from voices.txt. `start_refresh` fetches the
+    live list in the background once the snapshot is older than the TTL and
+    swaps the new index in as a whole, so readers never see a partial one.
+    """
+
+    def __init__(self, voices=(), fetched=0.0, snapshot=CATALOG_FILE):
+        self.snapshot = snapshot
+        self.fetched = fetched
+        self._listed = list(voices)
+        self._added = []
+        self._index = _Index(self._listed)
+        self._refreshing = False
+
+    @classmethod
+    def load(cls, snapshot=CATALOG_FILE, voices_file=VOICES_FILE):
+        if os.path.exists(snapshot):
+            try:
+                with open(snapshot, encoding="utf-8") as f:
+                    data = json.load(f)
+                return cls([Voice(**v) for v in data["voices"]], data["fetched"], snapshot)
+            except (ValueError, KeyError, TypeError) as e:
+                logger.warning("voice_catalog_snapshot_unreadable", extra={"error": repr(e)})
+        voices = []
+        if os.path.exists(voices_file):
+            with open(voices_file, encoding="utf-8") as f:
+                for line in f:
+                    fields = [field.strip() for field in line.split(" - ")]
+                    if len(fields) == 3:
+                        voices.append(Voice(*fields))
+        fetched = os.path.getmtime(voices_file) if voices else 0.0
+        return cls(voices, fetched, snapshot)
+
+    def __len__(self):
+        return len(self._index.voices)
+
+    def languages(self):
+        return list(self._index.languages)
+
+    def get(self, voice_id):
+        return self._index.by_id.get(voice_id)
+
+    def voices(self, language=None, gender=None):
+        """Voices of `language` (all languages if None), optionally only one gender."""
+        index = self._index
+        voices = index.voices if language is None else index.by_language.get(language, [])
+        if gender is None:
+            return list(voices)
+        if language is None:
+            return list(index.by_gender.get(gender, []))
+        return [v for v in voices if v.gender == gender]
+
+    def by_locale(self, locale):
+        return list(self._index.by_locale.get(locale, []))
+
+    def labels(self, language):
+        return [v.label for v in self._index.by_language.get(language, [])]
+
+    def voice_ids(self, language=None):
+        return [v.voice_id for v in self.voices(language)]
+
+    def find(self, language, label):
+        """Voice id for a dropdown label in `language`, or None."""
+        voice = self._index.by_label.get((language, label))
+        return voice.voice_id if voice else None
+
+    def resolve(self, language, voice):
+        """
+        Voice id for `voice` given as an id or a label. Labels are looked up in
+        `language`, or in every language when it is empty or unknown.
+        """
+        index = self._index
+        if voice in index.by_id:
+            return voice
+        if language in index.by_language:
+            return self.find(language, voice)
+        found = index.by_label.get((None, voice))
+        return found.voice_id if found else None
+
+    def add_voices(self, voices):
+        """Offer voices served by other backends too; they survive refreshes but aren't saved."""
+        self._added = [v for v in self._added if v not in voices] + list(voices)
+        self._index = _Index(self._listed + self._added)
+
+    def save(self):
+        data = {"fetched": self.fetched, "voices": [asdict(v) for v in self._listed]}
+        partial = self.snapshot + ".part"
+        with open(partial, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(partial, self.snapshot)
+
+    async def refresh(self):
+        """Fetch the live voice list, swap it in and save a snapshot."""
+        listed = await edge_tts.list_voices()
+        voices = [Voice(v["ShortName"], v["Gender"], v["Locale"]) for v in listed]
+        if not voices:
+            raise ValueError("The service returned no voices")
+        self._listed = voices
+        self._index = _Index(voices + self._added)
+        self.fetched = time.time()
+        self.save()
+        logger.info("voice_catalog_refreshed", extra={"voices": len(voices)})
+
+    async def _refresh_forever(self, ttl):
+        while True:
+            wait = self.fetched + ttl - time.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning("voice_catalog_refresh_failed", extra={"error": repr(e)})
+                await asyncio.sleep(min(ttl, RETRY_INTERVAL))
+
+    def start_refresh(self, ttl=CATALOG_TTL):
+        """Keep the catalog fresh from the service loop. No-op if `ttl` is 0."""
+        if ttl <= 0 or self._refreshing:
+            return
+        self._refreshing = True
+        service_loop.submit(self._refresh_forever(ttl))
+
+
+voice_catalog = VoiceCatalog.load()
@@ -0,0 +1,220 @@
+"""
+Worker processes for the chunk queue (see `workqueue`).
+
+    python -m voicegen.worker --name worker-1
+    python -m voicegen.worker --workers auto
+
+A worker claims up to `--concurrency` chunk calls at a time, synthesizes
+each with the backend serving its voice on the process's event loop, and
+stores the audio back in the queue. The apps start TTS_WORKERS of these
+at launch with `start_workers` and restart any that die. With `--workers`
+this module runs such a pool on its own instead, for several UI and API
+processes started with TTS_WORKERS=external to share.
+"""
+import argparse
+import asyncio
+import atexit
+import math
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+from .backends import backend_for, backends_in_use, set_dispatcher
+from .logs import configure_logging, logger, request_id
+from .edge import POOL_SIZE
+from .scheduler import scheduler
+from .workqueue import POLL_MAX, POLL_MIN, QUEUE_DB, WORKER_TIMEOUT, ChunkQueue, Dispatcher, error_type
+
+
+# Worker processes started by the apps: 0 synthesizes in the UI process, "auto" one per usable core,
+# "external" uses the pool of a separate `python -m voicegen.worker --workers N` on the same queue.
+WORKERS = os.environ.get("TTS_WORKERS", "0")
+EXTERNAL = "external"
+RESTART_DELAY = 2  # seconds between checks for dead workers
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _cgroup_quota():
+    """The container's CPU quota in cores (cgroup v2, else v1), or None when it has none."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        return quota / period if quota > 0 and period > 0 else None
+    except (OSError, ValueError):
+        return None
+
+
+def usable_cores():
+    """The cores this process may use: its CPU affinity, capped by a container's CPU quota."""
+    if hasattr(os, "sched_getaffinity"):
+        cores = len(os.sched_getaffinity(0))  # not the host's, but blind to cgroup quotas
+    else:
+        cores = os.cpu_count() or 1
+    quota = _cgroup_quota()
+    return max(1, min(cores, math.ceil(quota))) if quota else cores
+
+
+def worker_count(setting=WORKERS):
+    """How many worker processes a TTS_WORKERS setting asks for."""
+    if setting == "auto":
+        return usable_cores()
+    return int(setting or 0)
+
+
+class Worker:
+    """One worker process's claim loop. Exits when the process that started it goes away."""
+
+    def __init__(self, queue, name, concurrency):
+        self.queue = queue
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self._running = set()
+        self._parent = os.getppid()
+
+    async def run(self):
+        for backend in backends_in_use():
+            asyncio.ensure_future(backend.warm())
+        await asyncio.to_thread(self.queue.join, self.name)
+        delay, beat = POLL_MIN, time.monotonic()
+        try:
+            while os.getppid() == self._parent:
+                if time.monotonic() - beat > WORKER_TIMEOUT / 3:
+                    await asyncio.to_thread(self.queue.heartbeat, self.name)
+                    beat = time.monotonic()
+                free = self.concurrency - len(self._running)
+                claimed = await asyncio.to_thread(self.queue.claim, self.name, free) if free else []
+                for task in claimed:
+                    call = asyncio.ensure_future(self._execute(*task))
+                    self._running.add(call)
+                    call.add_done_callback(self._running.discard)
+                delay = POLL_MIN if claimed else min(delay * 2, POLL_MAX)
+                await asyncio.sleep(delay)
+        finally:
+            for call in self._running:
+                call.cancel()
+            await asyncio.gather(*self._running, return_exceptions=True)
+            await asyncio.to_thread(self.queue.leave, self.name)
+            for backend in backends_in_use():
+                await backend.close()
+
+    async def _execute(self, task_id, rid, text, voice_id, output_format):
+        request_id.set(rid)
+        try:
+            audio = await backend_for(voice_id).synthesize(text, voice_id, output_format)
+        except Exception as e:
+            logger.warning("worker_call_failed", extra={"worker": self.name, "voice": voice_id, "error": repr(e)})
+            await asyncio.to_thread(self.queue.finish, task_id, self.name,
+                                    error=f"{type(e).__name__}: {e}", error_type=error_type(e))
+        else:
+            await asyncio.to_thread(self.queue.finish, task_id, self.name, audio=audio)
+
+
+def spawn_workers(count, queue_db=QUEUE_DB):
+    """
+    Start `count` worker processes on `queue_db` and restart any that die;
+    returns the number started and a function that stops them. The
+    scheduler's upstream limit (TTS_MAX_IN_FLIGHT) is divided among the
+    workers, so they never hold more calls than it allows between them, and
+    there are never more workers than slots.
+    """
+    count = min(count, scheduler.max_in_flight)
+    if count <= 0:
+        return 0, lambda: None
+    concurrency = math.ceil(scheduler.max_in_flight / count)
+    command = [sys.executable, "-m", "voicegen.worker", "--queue", queue_db, "--concurrency", str(concurrency), "--name"]
+    # Each worker keeps (and warms) only as many idle connections as it can use.
+    env = dict(os.environ, TTS_EDGE_POOL_SIZE=str(min(POOL_SIZE, concurrency)))
+    processes = {}
+    stopping = threading.Event()
+
+    def spawn(name):
+        processes[name] = subprocess.Popen(command + [name], cwd=_ROOT, env=env)
+
+    def supervise():
+        while not stopping.wait(RESTART_DELAY):
+            for name, process in list(processes.items()):
+                if process.poll() is not None:
+                    logger.error("worker_died", extra={"worker": name, "returncode": process.returncode})
+                    spawn(name)
+
+    def stop():
+        stopping.set()
+        for process in processes.values():
+            process.terminate()
+
+    for i in range(count):
+        spawn(f"worker-{i + 1}")
+    threading.Thread(target=supervise, name="voicegen-workers", daemon=True).start()
+    atexit.register(stop)
+    logger.info("workers_started", extra={"workers": count, "concurrency": concurrency, "queue": queue_db})
+    return count, stop
+
+
+def start_workers(setting=WORKERS, queue_db=QUEUE_DB):
+    """
+    Hand this process's remote chunk calls to worker processes, as a
+    TTS_WORKERS setting asks: start that many (or one per usable core for
+    "auto"), or for "external" use the workers another process runs on the
+    same queue. Returns the dispatcher, or None when the calls stay here.
+    """
+    if setting != EXTERNAL:
+        started, _ = spawn_workers(worker_count(setting), queue_db)
+        if not started:
+            return None
+    dispatcher = Dispatcher(ChunkQueue(queue_db))
+    set_dispatcher(dispatcher)
+    return dispatcher
+
+
+async def _serve(worker):
+    task = asyncio.ensure_future(worker.run())
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        asyncio.get_running_loop().add_signal_handler(signum, task.cancel)
+    try:
+        await task
+    except asyncio.CancelledError:
+        logger.info("worker_stopped", extra={"worker": worker.name})
+
+
+def _supervise(count, queue_db):
+    """Run a pool of `count` workers until SIGTERM or SIGINT."""
+    started, stop = spawn_workers(count, queue_db)
+    if not started:
+        sys.exit("voicegen.worker: --workers must be at least 1")
+    stopped = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stopped.set())
+    stopped.wait()
+    stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthesize chunk calls from the shared worker queue.")
+    parser.add_argument("--name", default=f"worker-{os.getpid()}")
+    parser.add_argument("--concurrency", type=int, default=scheduler.max_in_flight)
+    parser.add_argument("--queue", default=QUEUE_DB)
+    parser.add_argument("--workers", help='run and supervise this many workers ("auto": one per usable core)')
+    args = parser.parse_args()
+
+    configure_logging()
+    if args.workers:
+        _supervise(worker_count(args.workers), args.queue)
+        return
+    worker = Worker(ChunkQueue(args.queue), args.name, args.concurrency)
+    asyncio.run(_serve(worker))
+
+
+if __name__ == "__main__":
+    main()
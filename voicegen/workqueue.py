@@ -0,0 +1,285 @@
+"""
+A chunk queue shared between UI/API processes and worker processes.
+
+With TTS_WORKERS set, a UI process keeps its sessions, cache and merging,
+and hands every remote chunk call to a SQLite queue instead of calling the
+backend itself. Worker processes (`python -m voicegen.worker`) claim calls
+from the queue, synthesize them and store the audio in the row; the UI
+process that put a call there (its `owner`) collects the result and
+resolves the waiting request. The queue lives in one WAL-mode database
+file, so several UI and API processes on the host can share one pool of
+workers. The workers' slots add up to TTS_MAX_IN_FLIGHT, which keeps the
+upstream limit global however many processes feed the queue, and calls
+are claimed short jobs first, round-robin across jobs, like the scheduler.
+"""
+import asyncio
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+
+from .backends import SynthesisBackend, get_dispatcher
+from .logs import logger, request_id
+from .metrics import Gauge
+from .pipeline import current_job
+from .resilience import NON_RETRYABLE
+from .scheduler import SHORT_JOB_CHARS
+
+
+QUEUE_DB = os.environ.get("TTS_QUEUE_DB", os.path.join(tempfile.gettempdir(), "voicegen-queue.sqlite3"))
+# A worker that hasn't checked in for this many seconds is presumed dead and its calls are queued again.
+WORKER_TIMEOUT = float(os.environ.get("TTS_WORKER_TIMEOUT", 15))
+# Seconds between queue polls: a UI process polls every POLL_MIN while it
+# waits for calls; an idle worker backs off to POLL_MAX.
+POLL_MIN, POLL_MAX = 0.01, 0.05
+STALE_AFTER = 3600  # seconds before rows left by a process that went away are purged
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    owner TEXT NOT NULL,
+    job TEXT,
+    job_chars INTEGER NOT NULL DEFAULT 0,
+    request_id TEXT,
+    text TEXT NOT NULL,
+    voice TEXT NOT NULL,
+    format TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    worker TEXT,
+    result BLOB,
+    error TEXT,
+    error_type TEXT,
+    created REAL NOT NULL,
+    claimed REAL
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, id);
+CREATE INDEX IF NOT EXISTS tasks_owner ON tasks (owner, status);
+CREATE TABLE IF NOT EXISTS workers (
+    name TEXT PRIMARY KEY,
+    pid INTEGER,
+    seen REAL NOT NULL
+);
+"""
+
+
+class WorkerError(RuntimeError):
+    """A chunk call that failed in a worker process; the message names the original error."""
+
+
+def error_type(error):
+    """What a worker stores as a failed call's type: the non-retryable base class it falls under, else its own name."""
+    return next((kind.__name__ for kind in NON_RETRYABLE if isinstance(error, kind)), type(error).__name__)
+
+
+def worker_error(kind, message):
+    """The exception a failed worker call raises here: non-retryable types as themselves, so they aren't retried."""
+    for error in NON_RETRYABLE:
+        if error.__name__ == kind:
+            return error(message)
+    return WorkerError(message)
+
+
+class ChunkQueue:
+    """
+    The queue database. Each thread gets its own connection; every method is
+    one short transaction, so call them off the event loop.
+    """
+
+    def __init__(self, path=QUEUE_DB):
+        self.path = path
+        self._local = threading.local()
+        db = self._db()
+        db.executescript(SCHEMA)
+        # A queue file from an earlier version lacks the newer columns.
+        columns = {row[1] for row in db.execute("PRAGMA table_info(tasks)")}
+        for column, kind in (("error_type", "TEXT"), ("job", "TEXT"), ("job_chars", "INTEGER NOT NULL DEFAULT 0")):
+            if column not in columns:
+                db.execute(f"ALTER TABLE tasks ADD COLUMN {column} {kind}")
+
+    def _db(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def put(self, owner, text, voice_id, output_format, rid=None, job=None, job_chars=0):
+        """Queue one chunk call of `job` (a script of `job_chars` characters); returns its task id."""
+        cursor = self._db().execute(
+            "INSERT INTO tasks (owner, job, job_chars, request_id, text, voice, format, created) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (owner, job, job_chars, rid, text, voice_id, output_format, time.time()))
+        return cursor.lastrowid
+
+    def claim(self, worker, limit, short_chars=SHORT_JOB_CHARS):
+        """
+        Up to `limit` queued calls, now running on `worker`: calls of jobs up
+        to `short_chars` long first, then each job's oldest call in turn.
+        """
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            rows = db.execute(
+                "SELECT id, request_id, text, voice, format FROM ("
+                "  SELECT *, ROW_NUMBER() OVER (PARTITION BY job ORDER BY id) AS turn FROM tasks WHERE status = ?"
+                ") ORDER BY job_chars > ?, turn, id LIMIT ?",
+                (QUEUED, short_chars, limit)).fetchall()
+            db.executemany("UPDATE tasks SET status = ?, worker = ?, claimed = ? WHERE id = ?",
+                           [(RUNNING, worker, time.time(), row[0]) for row in rows])
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return rows
+
+    def finish(self, task_id, worker, audio=None, error=None, error_type=None):
+        """Store a claimed call's audio, or its error and error type. A call queued again meanwhile is left alone."""
+        self._db().execute(
+            "UPDATE tasks SET status = ?, result = ?, error = ?, error_type = ? "
+            "WHERE id = ? AND status = ? AND worker = ?",
+            (FAILED if error else DONE, audio, error, error_type, task_id, RUNNING, worker))
+
+    def collect(self, owner):
+        """`(id, status, result, error, error_type)` of `owner`'s finished calls, which are removed from the queue."""
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            rows = db.execute(
+                "SELECT id, status, result, error, error_type FROM tasks WHERE owner = ? AND status IN (?, ?)",
+                (owner, DONE, FAILED)).fetchall()
+            db.executemany("DELETE FROM tasks WHERE id = ?", [(row[0],) for row in rows])
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return rows
+
+    def cancel(self, task_id):
+        """Forget a call nobody waits for; a worker already running it finishes into nothing."""
+        self._db().execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+
+    def join(self, worker):
+        """A worker starting: calls left running under its name by an earlier process go back to the queue."""
+        self._db().execute("UPDATE tasks SET status = ?, worker = NULL, claimed = NULL WHERE status = ? AND worker = ?",
+                           (QUEUED, RUNNING, worker))
+        self.heartbeat(worker)
+
+    def heartbeat(self, worker, pid=None):
+        self._db().execute("INSERT OR REPLACE INTO workers (name, pid, seen) VALUES (?, ?, ?)",
+                           (worker, pid or os.getpid(), time.time()))
+
+    def leave(self, worker):
+        """A worker shutting down: its running calls go back to the queue."""
+        self._db().execute("DELETE FROM workers WHERE name = ?", (worker,))
+        self.requeue_stale()
+
+    def requeue_stale(self, timeout=WORKER_TIMEOUT):
+        """Queue again the calls of workers that stopped checking in; returns how many."""
+        db = self._db()
+        cursor = db.execute(
+            "UPDATE tasks SET status = ?, worker = NULL, claimed = NULL WHERE status = ? AND worker NOT IN "
+            "(SELECT name FROM workers WHERE seen >= ?)", (QUEUED, RUNNING, time.time() - timeout))
+        db.execute("DELETE FROM workers WHERE seen < ?", (time.time() - STALE_AFTER,))
+        return cursor.rowcount
+
+    def purge(self, owner=None, older_than=STALE_AFTER):
+        """Drop `owner`'s rows, and any row older than `older_than` seconds (left by a process that went away)."""
+        self._db().execute("DELETE FROM tasks WHERE owner = ? OR created < ?", (owner, time.time() - older_than))
+
+    def counts(self):
+        """Calls in the queue by status."""
+        return dict(self._db().execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+
+    def workers_alive(self, timeout=WORKER_TIMEOUT):
+        return self._db().execute("SELECT COUNT(*) FROM workers WHERE seen >= ?",
+                                  (time.time() - timeout,)).fetchone()[0]
+
+
+class Dispatcher:
+    """
+    The UI side of the queue: puts chunk calls in it and resolves each caller
+    once a worker has finished its call. One poller collects every finished
+    call of this process and, now and then, queues again the calls of dead
+    workers. Must only be used from one event loop (the service loop).
+    """
+
+    def __init__(self, queue, owner=None):
+        self.queue = queue
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        self._waiting = {}  # task id -> future
+        self._backends = {}
+        self._poller = None
+        queue.purge(self.owner)
+
+    def backend(self, inner):
+        """`inner` with its calls made by worker processes."""
+        if inner.name not in self._backends:
+            self._backends[inner.name] = DispatchBackend(inner, self)
+        return self._backends[inner.name]
+
+    async def synthesize(self, text, voice_id, output_format):
+        job, job_chars = current_job.get() or (None, len(text))
+        task_id = await asyncio.to_thread(self.queue.put, self.owner, text, voice_id, output_format,
+                                          request_id.get(), job, job_chars)
+        result = self._waiting[task_id] = asyncio.get_running_loop().create_future()
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.ensure_future(self._poll())
+        try:
+            return await result
+        finally:
+            if self._waiting.pop(task_id, None) is not None:
+                await asyncio.to_thread(self.queue.cancel, task_id)
+
+    async def _poll(self):
+        reaped = time.monotonic()
+        while self._waiting:
+            try:
+                finished = await asyncio.to_thread(self.queue.collect, self.owner)
+                if time.monotonic() - reaped > WORKER_TIMEOUT / 3:
+                    reaped = time.monotonic()
+                    requeued = await asyncio.to_thread(self.queue.requeue_stale)
+                    if requeued:
+                        logger.warning("worker_calls_requeued", extra={"calls": requeued})
+            except sqlite3.Error as e:
+                logger.error("queue_poll_failed", extra={"error": repr(e)})
+                finished = []
+            for task_id, status, audio, error, kind in finished:
+                result = self._waiting.pop(task_id, None)
+                if result is None or result.done():
+                    continue
+                if status == DONE:
+                    result.set_result(bytes(audio))
+                else:
+                    result.set_exception(worker_error(kind, error))
+            await asyncio.sleep(POLL_MIN)
+
+
+class DispatchBackend(SynthesisBackend):
+    """A remote backend whose calls run in worker processes; same name and cache entries as `inner`."""
+
+    def __init__(self, inner, dispatcher):
+        self.inner = inner
+        self.dispatcher = dispatcher
+        self.name = inner.name
+        self.remote = inner.remote
+
+    def cache_format(self, output_format):
+        return self.inner.cache_format(output_format)
+
+    async def synthesize(self, text, voice_id, output_format):
+        return await self.dispatcher.synthesize(text, voice_id, output_format)
+
+    async def warm(self):
+        """Workers warm their own connections."""
+
+
+Gauge("tts_worker_calls", "Chunk calls in the worker queue by status.", ["status"],
+      fn=lambda: {(status,): n for status, n in get_dispatcher().queue.counts().items()} if get_dispatcher() else {})
+Gauge("tts_workers_alive", "Worker processes that checked in recently.",
+      fn=lambda: get_dispatcher().queue.workers_alive() if get_dispatcher() else 0)